@@ -0,0 +1,224 @@
+'''
+Shared game assets: per-type entity artwork, fonts and sounds
+
+Every asset is loaded on first request and kept, so each is loaded once
+however many entities, widgets or towers use it. pygame's font and mixer
+modules are started by init(), or by the first font or sound asked for, so
+importing this module opens nothing. preload() loads a set of assets up
+front, optionally on a background thread while the game starts up; the
+modules are always started on the calling thread, so the background
+thread only loads files.
+'''
+import os
+import threading
+import time
+import pygame
+import consts
+from sprite_cache import FrameCache
+
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assests', 'sounds')
+
+FREE_CHANNELS = 8               # Mixer channels left unreserved for other sounds
+
+# Sound files by name
+SOUNDS = {
+    'shot': 'shot_sound.wav',
+}
+
+
+class SpriteAssets:
+    '''Artwork shared by every entity of one type'''
+
+    __slots__ = ('name', 'base_image', 'frames')
+
+    def __init__(self, name, base_image):
+        self.name = name
+        self.base_image = base_image            # Unrotated artwork
+        self.frames = FrameCache(base_image)    # Rotated/faded variants
+
+
+def _enemy_image():
+    image = pygame.Surface((20, 20), pygame.SRCALPHA)
+    pygame.draw.rect(image, (255, 0, 0), (0, 0, 20, 20))
+    return image
+
+
+def _projectile_image():
+    image = pygame.Surface((6, 6))
+    pygame.draw.circle(image, (255, 255, 0), (3, 3), 3)
+    return image
+
+
+# Builders for each entity type, run once on first use
+_builders = {
+    'enemy': _enemy_image,
+    'projectile': _projectile_image,
+}
+_registry = {}
+_fonts = {}
+_sounds = {}
+_sound_pools = {}
+_reserved_channels = 0          # Mixer channels handed to sound pools
+_lock = threading.RLock()       # Loads from preload() and the game don't overlap
+muted = False                   # Sound pools play nothing while set
+preload_ms = None               # Duration of the last preload()
+_audio = None                   # Whether the mixer started, once tried
+
+
+def register(name, builder):
+    '''Add or replace the image builder for an entity type'''
+    _builders[name] = builder
+    _registry.pop(name, None)
+
+
+def get(name):
+    '''Shared SpriteAssets for an entity type, built on first request'''
+    sprite_assets = _registry.get(name)
+    if sprite_assets is None:
+        with _lock:
+            sprite_assets = _registry.get(name)
+            if sprite_assets is None:
+                sprite_assets = SpriteAssets(name, _builders[name]())
+                _registry[name] = sprite_assets
+    return sprite_assets
+
+
+def init():
+    '''
+    Start pygame's font and mixer modules, leaving sounds off if there is
+    no audio device. Call from the main thread.
+    '''
+    if not pygame.font.get_init():
+        pygame.font.init()
+    _start_mixer()
+
+
+def _start_mixer():
+    '''Start the mixer if that hasn't been tried yet; True if it is running'''
+    global _audio
+    if _audio is None:
+        with _lock:
+            if _audio is None:
+                try:
+                    if not pygame.mixer.get_init():
+                        pygame.mixer.init()
+                    _audio = True
+                except pygame.error:
+                    _audio = False
+    return _audio
+
+
+def font(size):
+    '''Shared default font at the given size'''
+    loaded = _fonts.get(size)
+    if loaded is None:
+        with _lock:
+            loaded = _fonts.get(size)
+            if loaded is None:
+                if not pygame.font.get_init():
+                    pygame.font.init()
+                loaded = pygame.font.Font(None, size)
+                _fonts[size] = loaded
+    return loaded
+
+
+def sound(name):
+    '''
+    Shared pygame Sound for a name in SOUNDS, or None if there is no audio
+    device. A failed load is remembered and not retried.
+    '''
+    if name in _sounds:
+        return _sounds[name]
+    with _lock:
+        if name not in _sounds:
+            loaded = None
+            if _start_mixer():
+                try:
+                    loaded = pygame.mixer.Sound(os.path.join(SOUND_DIR, SOUNDS[name]))
+                except pygame.error:
+                    pass
+            _sounds[name] = loaded
+    return _sounds[name]
+
+
+class SoundPool:
+    '''
+    A preloaded sound played round robin on its own reserved mixer
+    channels, so rapid repeats cost one Channel.play() each and never take
+    channels other sounds need. Does nothing without a sound or while muted.
+    '''
+
+    def __init__(self, sound, channels):
+        self.sound = sound
+        self.channels = channels
+        self.next = 0
+        self.played = 0
+
+    def play(self):
+        '''Play the sound on the next channel, cutting off its oldest play'''
+        if self.sound is None or muted:
+            return
+        self.channels[self.next].play(self.sound)
+        self.next = (self.next + 1) % len(self.channels)
+        self.played += 1
+
+
+def sound_pool(name, channels=consts.SOUND_POOL_CHANNELS):
+    '''Shared SoundPool for a name in SOUNDS'''
+    global _reserved_channels
+    pool = _sound_pools.get(name)
+    if pool is None:
+        with _lock:
+            pool = _sound_pools.get(name)
+            if pool is None:
+                loaded = sound(name)
+                reserved = []
+                if loaded is not None:
+                    first = _reserved_channels
+                    _reserved_channels += channels
+                    # Keep as many free channels as the mixer starts with
+                    if pygame.mixer.get_num_channels() < _reserved_channels + FREE_CHANNELS:
+                        pygame.mixer.set_num_channels(_reserved_channels + FREE_CHANNELS)
+                    pygame.mixer.set_reserved(_reserved_channels)
+                    reserved = [pygame.mixer.Channel(i)
+                                for i in range(first, _reserved_channels)]
+                pool = SoundPool(loaded, reserved)
+                _sound_pools[name] = pool
+    return pool
+
+
+def preload(fonts=(), sounds=(), sprites=(), background=False):
+    '''
+    Load the given font sizes, sound names and entity types now, or on a
+    daemon thread with background. The pygame modules they need are
+    started first, on this thread. Returns the thread, or None, and keeps
+    the time the loads took in preload_ms.
+    '''
+    def load():
+        global preload_ms
+        start = time.perf_counter()
+        for size in fonts:
+            font(size)
+        for name in sounds:
+            sound(name)
+        for name in sprites:
+            get(name)
+        preload_ms = (time.perf_counter() - start) * 1000
+
+    init()
+    if not background:
+        load()
+        return None
+    thread = threading.Thread(target=load, name='preload', daemon=True)
+    thread.start()
+    return thread
+
+
+def memory_bytes():
+    '''Pixel memory held by all registered base images and frame caches'''
+    total = 0
+    for sprite_assets in _registry.values():
+        image = sprite_assets.base_image
+        total += image.get_width() * image.get_height() * image.get_bytesize()
+        total += sprite_assets.frames.memory_bytes()
+    return total
@@ -0,0 +1,248 @@
+'''
+Benchmark suite of scripted load scenarios
+
+Drives GameManager (and the GUI) under the SDL dummy drivers through fixed
+scenarios and reports per-tick latency percentiles, ticks/sec and
+allocation figures as JSON, so runs can be compared across commits:
+
+    python benchmark.py --output before.json
+    python benchmark.py --compare before.json
+
+--snapshot adds a scenario that starts from a saved game (see snapshot.py),
+so late-wave states can be measured without simulating up to them.
+--wasted-shots reports how many shots the high fire rate scenarios waste
+on overkill, with and without the pending-damage ledger.
+'''
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pygame as pg
+import consts
+import game_manager
+import gui
+import render
+import snapshot
+
+SEED = 1234
+IMMORTAL = 10**12           # Tower health that no scenario can wear down
+TOWER_RING_RADIUS = 250     # Distance of extra towers from the main one
+
+
+def _steady_game(wave, cooldown=None, extra_enemies=0, spawn_budget=None,
+                 projectile_engine='array', towers=0, ledger=True):
+    '''Headless game at the given wave with its spawn queue already drained'''
+    game = game_manager.GameManager(spawn_budget=spawn_budget, seed=SEED,
+                                    projectile_engine=projectile_engine,
+                                    ledger=ledger)
+    game.tower.health = game.tower.max_health = IMMORTAL
+    if cooldown is not None:
+        game.tower.cooldown = game.tower.cooldown_count = cooldown
+    if towers:
+        game.add_tower_ring(towers, TOWER_RING_RADIUS, cooldown=game.tower.cooldown)
+
+    game.wave_number = wave - 1
+    game.start_game()
+    if extra_enemies:
+        game.spawner.queue(extra_enemies)
+    while game.spawner.pending:
+        game.update()
+    return game.update
+
+
+def _snapshot_game(path):
+    '''Headless game resumed from a saved snapshot'''
+    game = game_manager.GameManager()
+    snapshot.load(game, path)
+    game.tower.health = game.tower.max_health = IMMORTAL
+    return game.update
+
+
+def _gui_frame():
+    '''HUD update and draw only, with no simulation'''
+    screen = pg.display.set_mode((consts.SCREEN_WIDTH, consts.SCREEN_HEIGHT))
+    game = game_manager.GameManager()
+    interface = gui.Interface(game)
+
+    def step():
+        interface.update()
+        interface.draw(screen)
+    return step
+
+
+def _entity_frame(enemies, point_cloud=None):
+    '''Drawing only, of a field of enemies, as sprites or as a point cloud'''
+    screen = pg.display.set_mode((consts.SCREEN_WIDTH, consts.SCREEN_HEIGHT))
+    game = _steady_game(1, cooldown=5, extra_enemies=enemies).__self__
+    game.screen = screen
+
+    def step():
+        screen.fill(consts.BACKGROUND_COLOR)
+        game.draw(point_cloud)
+    return step
+
+
+SCENARIOS = {
+    'wave_1': lambda: _steady_game(1),
+    'wave_10': lambda: _steady_game(10),
+    'wave_50': lambda: _steady_game(50),
+    'wave_200': lambda: _steady_game(200),
+    'max_fire_rate': lambda: _steady_game(50, cooldown=5),
+    'max_fire_rate_event': lambda: _steady_game(50, cooldown=5,
+                                                projectile_engine='event'),
+    'stress_10k': lambda: _steady_game(1, extra_enemies=10_000),
+    'towers_50': lambda: _steady_game(1, cooldown=5, extra_enemies=5_000, towers=50),
+    'gui_frame': _gui_frame,
+    'draw_10k_sprites': lambda: _entity_frame(10_000),
+    'draw_10k_points': lambda: _entity_frame(10_000, render.PointCloud()),
+}
+
+
+# High fire rate setups for wasted_shots()
+WASTE_SCENARIOS = {
+    'max_fire_rate': dict(wave=50, cooldown=5),
+    'max_fire_rate_event': dict(wave=50, cooldown=5, projectile_engine='event'),
+    'towers_8': dict(wave=50, cooldown=5, towers=8),
+}
+
+
+def wasted_shots(ticks):
+    '''Shot outcomes of each WASTE_SCENARIOS game without and with the ledger'''
+    results = {}
+    for name, setup in WASTE_SCENARIOS.items():
+        for ledger in (False, True):
+            game = _steady_game(ledger=ledger, **setup).__self__
+            game.run_ticks(ticks)
+            results[f"{name}{'_ledger' if ledger else ''}"] = game.shot_stats()
+    return results
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def run_scenario(setup, ticks):
+    '''Time ticks steps of a fresh scenario, then measure its allocations'''
+    step = setup()
+    times = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        step()
+        times.append(time.perf_counter() - start)
+
+    # Allocations are traced on a second, identical run since tracing
+    # slows every allocation down
+    step = setup()
+    peaks = []
+    blocks = []
+    tracemalloc.start()
+    for _ in range(ticks):
+        tracemalloc.reset_peak()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        start_blocks = sys.getallocatedblocks()
+        step()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        peaks.append(peak_bytes - start_bytes)
+        blocks.append(sys.getallocatedblocks() - start_blocks)
+    tracemalloc.stop()
+
+    times_ms = np.array(times) * 1000
+    return {
+        'ticks': ticks,
+        'p50_ms': round(_percentile(times_ms, 50), 4),
+        'p99_ms': round(_percentile(times_ms, 99), 4),
+        'mean_ms': round(float(times_ms.mean()), 4),
+        'ticks_per_sec': round(ticks / sum(times), 1),
+        # Bytes allocated on top of the tick's starting footprint
+        'alloc_peak_bytes_per_tick': round(float(np.mean(peaks)), 1),
+        # Net memory blocks still allocated after the tick
+        'net_blocks_per_tick': round(float(np.mean(blocks)), 2),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names, ticks):
+    '''Run the named scenarios and return the full report'''
+    pg.init()
+    results = {}
+    for name in names:
+        results[name] = run_scenario(SCENARIOS[name], ticks)
+    return {
+        'meta': {
+            'commit': _commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pg.version.ver,
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+        },
+        'scenarios': results,
+    }
+
+
+def compare(report, baseline):
+    '''Print p50/p99 and throughput ratios against a baseline report'''
+    print(f"{'scenario':<16}{'p50 x':>9}{'p99 x':>9}{'ticks/s x':>11}")
+    for name, result in report['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        ratios = [result['p50_ms'] / base['p50_ms'] if base['p50_ms'] else 0,
+                  result['p99_ms'] / base['p99_ms'] if base['p99_ms'] else 0,
+                  result['ticks_per_sec'] / base['ticks_per_sec']]
+        print(f'{name:<16}' + ''.join(f'{r:>9.2f}' for r in ratios[:2]) +
+              f'{ratios[2]:>11.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS),
+                        help='scenario to run (repeatable, default: all)')
+    parser.add_argument('--ticks', type=int, default=600,
+                        help='ticks measured per scenario')
+    parser.add_argument('--output', help='write the JSON report to this file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare against an earlier JSON report')
+    parser.add_argument('--snapshot', metavar='PATH',
+                        help="add a 'snapshot' scenario resumed from a saved game")
+    parser.add_argument('--wasted-shots', action='store_true',
+                        help='report wasted shots with and without the ledger')
+    args = parser.parse_args()
+
+    if args.wasted_shots:
+        print(json.dumps(wasted_shots(args.ticks), indent=2))
+        raise SystemExit
+
+    if args.snapshot:
+        SCENARIOS['snapshot'] = lambda: _snapshot_game(args.snapshot)
+
+    names = args.scenario or list(SCENARIOS)
+    if args.snapshot and 'snapshot' not in names:
+        names.append('snapshot')
+    report = run(names, args.ticks)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    elif not args.output:
+        print(text)
@@ -0,0 +1,285 @@
+'''
+Event-driven combat for headless runs
+
+Instead of stepping every projectile every frame, ImpactScheduler works out
+at fire time the tick each shot will land and queues its damage for that
+tick. Select it with GameManager(projectile_engine='event'). Running this
+module compares it against the per-frame projectile simulation:
+
+    python combat.py --seeds 5 --ticks 20000
+'''
+import argparse
+import bisect
+import heapq
+import math
+import time
+import pygame
+import consts
+import game_manager
+from enemy_store import ALIVE, DEAD, DYING, FREE
+from projectile_store import CULL_MARGIN, HIT_RADIUS_SQ, SIZE
+
+MAX_FLIGHT_TICKS = 10_000       # Give up on shots that never land
+TOWER_RING_RADIUS = 150         # Distance of validate()'s extra towers
+
+
+def _round(v):
+    '''Scalar spatial.round_center: round like pygame.Rect does'''
+    return math.copysign(math.floor(abs(v) + 0.5), v)
+
+
+class ImpactScheduler:
+    '''
+    Predicted projectile impacts for an EnemyStore.
+
+    A shot's flight depends only on its target, whose future is known: it
+    walks straight at the tower until it arrives, keeps moving for one tick
+    after a lethal hit, then fades and is removed. fire() steps the shot
+    and its target forward together, using the same arithmetic as
+    EnemyStore.update() and ProjectileStore.update() and applying the
+    damage of shots already queued on that target, until the shot hits or
+    loses its target. The damage is then queued for the impact tick and
+    applied by update() at that tick.
+
+    Queued shots on a target are kept in impact order, so a shot from a
+    nearer tower can land before one fired earlier from further away. A
+    queued impact is not re-predicted when a later shot kills its target
+    first, so such overkill shots may land a few ticks off, and they are
+    not redirected the way ProjectileStore redirects orphaned shots. Queued
+    damage is kept in the store's pending-damage ledger until it lands.
+    validate() checks predictions against the per-frame simulation.
+    '''
+
+    def __init__(self, enemy_store):
+        self.enemy_store = enemy_store
+        self.tick = 0
+        self._events = []           # Heap of (tick, seq, slot, generation, damage)
+        self._seq = 0
+        self._pending = {}          # (slot, generation) -> queued (tick, seq, damage)
+
+        self.fired = 0              # Shots fired
+        self.hits = 0               # Shots that damaged a living enemy
+        self.overkill = 0           # Shots that hit an enemy already dead
+        self.misses = 0             # Shots whose target was gone first
+
+    def __len__(self):
+        '''Shots in flight'''
+        return len(self._events)
+
+    def fire(self, pos, target, speed=5, damage=10):
+        '''Fire a shot from pos at an EnemyView and queue its impact'''
+        slot = target.index
+        key = (slot, int(self.enemy_store.generation[slot]))
+        pending = self._pending.setdefault(key, [])
+        self.fired += 1
+
+        impact = self._predict(pos, slot, speed, pending)
+        if impact is None:
+            self.misses += 1
+            if not pending:
+                del self._pending[key]
+            return
+        heapq.heappush(self._events, (impact, self._seq, key[0], key[1], damage))
+        bisect.insort(pending, (impact, self._seq, damage))
+        self._seq += 1
+        self.enemy_store.pending[slot] += damage
+
+    def _predict(self, pos, slot, speed, pending):
+        '''Tick a shot from pos will hit slot's enemy, or None if it won't'''
+        store = self.enemy_store
+        x = float(store.x[slot])
+        y = float(store.y[slot])
+        enemy_speed = float(store.speed[slot])
+        health = float(store.health[slot])
+        state = int(store.state[slot])
+        timer = int(store.death_timer[slot])
+        duration = int(store.death_duration[slot])
+        arrived = bool(store.arrived[slot])
+
+        half = SIZE // 2
+        left = _round(pos[0]) - half
+        top = _round(pos[1]) - half
+        landed = 0                          # Queued shots applied so far
+        tick = self.tick
+
+        for _ in range(MAX_FLIGHT_TICKS):
+            tick += 1
+
+            # The target's update (EnemyStore.update)
+            if state == ALIVE and not arrived:
+                dx = consts.TOWER_X - x
+                dy = consts.TOWER_Y - y
+                dist = math.sqrt(dx * dx + dy * dy)
+                x += dx / dist * enemy_speed
+                y += dy / dist * enemy_speed
+            if state == DYING:
+                timer += 1
+                if timer >= duration:
+                    state = DEAD
+            if state == ALIVE and health <= 0:
+                state = DYING
+                timer = 0
+            if state == ALIVE and not arrived:
+                dx = consts.TOWER_X - x
+                dy = consts.TOWER_Y - y
+                arrived = math.sqrt(dx * dx + dy * dy) <= consts.TOWER_SIZE
+
+            # Dead enemies are removed before projectiles move
+            if state == DEAD:
+                return None
+
+            # Earlier shots landing this tick
+            while landed < len(pending) and pending[landed][0] <= tick:
+                health -= pending[landed][2]
+                landed += 1
+
+            # The shot's update (ProjectileStore.update)
+            dx = _round(x) - (left + half)
+            dy = _round(y) - (top + half)
+            dist_sq = dx * dx + dy * dy
+            if dist_sq <= HIT_RADIUS_SQ:
+                return tick
+            dist = math.sqrt(dist_sq)
+            left = _round(left + speed * dx / dist)
+            top = _round(top + speed * dy / dist)
+
+            cx = left + half
+            cy = top + half
+            if (cx < -CULL_MARGIN or cx > consts.SCREEN_WIDTH + CULL_MARGIN or
+                    cy < -CULL_MARGIN or cy > consts.SCREEN_HEIGHT + CULL_MARGIN):
+                return None
+        return None
+
+    def update(self):
+        '''Advance a tick and apply the damage of shots landing now'''
+        self.tick += 1
+        store = self.enemy_store
+        events = self._events
+        while events and events[0][0] <= self.tick:
+            _, _, slot, generation, damage = heapq.heappop(events)
+            key = (slot, generation)
+            # Events leave the heap in (tick, seq) order, as pending is sorted
+            pending = self._pending[key]
+            pending.pop(0)
+            if not pending:
+                del self._pending[key]
+
+            if store.state[slot] != FREE and store.generation[slot] == generation:
+                if store.health[slot] > 0:
+                    self.hits += 1
+                else:
+                    self.overkill += 1
+                store.health[slot] -= damage
+                store.pending[slot] -= damage
+            else:
+                self.misses += 1
+
+
+class ImpactGroup(pygame.sprite.Group):
+    '''Stand-in projectile group whose shots exist only as queued impacts'''
+
+    def __init__(self, scheduler, *sprites):
+        super().__init__(*sprites)
+        self.scheduler = scheduler
+
+    def fire(self, pos, target, speed=5, damage=10):
+        '''Fire a shot; nothing is added to the group'''
+        self.scheduler.fire(pos, target, speed=speed, damage=damage)
+
+
+def _new_kills(game, seen):
+    '''Spawn numbers of enemies brought to zero health since the last call'''
+    store = game.enemy_store
+    top = store.top
+    killed = (store.state[:top] != FREE) & (store.health[:top] <= 0)
+    kills = set(store.order[:top][killed].tolist()) - seen
+    seen |= kills
+    return kills
+
+
+def validate(seed, ticks, cooldown=None, damage=None, immortal=False, towers=0,
+             ledger=False):
+    '''
+    Play the same seeded game with per-frame projectiles and with predicted
+    impacts side by side, and report ticks where their kills differ.
+    towers adds that many extra towers in a ring around the main one.
+    ledger turns on the pending-damage ledger; with extra towers this is
+    expected to differ, as only per-frame shots are redirected.
+    '''
+    games = [game_manager.GameManager(projectile_engine=engine, seed=seed,
+                                      ledger=ledger)
+             for engine in ('array', 'event')]
+    for game in games:
+        if cooldown is not None:
+            game.tower.cooldown = game.tower.cooldown_count = cooldown
+        if damage is not None:
+            game.tower.damage = damage
+        if immortal:
+            game.tower.health = game.tower.max_health = float('inf')
+        if towers:
+            game.add_tower_ring(towers, TOWER_RING_RADIUS, cooldown=game.tower.cooldown)
+        game.start_game()
+
+    seen = [set(), set()]
+    elapsed = [0.0, 0.0]
+    mismatches = []
+    kills = 0
+    tick = 0
+    while tick < ticks and not any(game.game_over for game in games):
+        tick += 1
+        for i, game in enumerate(games):
+            start = time.perf_counter()
+            game.update()
+            elapsed[i] += time.perf_counter() - start
+
+        simulated = _new_kills(games[0], seen[0])
+        predicted = _new_kills(games[1], seen[1])
+        kills += len(simulated)
+        if simulated != predicted:
+            mismatches.append({'tick': tick,
+                               'simulated_only': sorted(simulated - predicted),
+                               'predicted_only': sorted(predicted - simulated)})
+
+    simulated, predicted = games
+    return {
+        'seed': seed,
+        'ticks': tick,
+        'kills': kills,
+        'mismatched_kill_ticks': len(mismatches),
+        'mismatches': mismatches[:10],
+        'final_state_matches': (simulated.cash, simulated.wave_number,
+                                simulated.tower.health) ==
+                               (predicted.cash, predicted.wave_number,
+                                predicted.tower.health),
+        'simulated_ms_per_tick': 1000 * elapsed[0] / max(tick, 1),
+        'predicted_ms_per_tick': 1000 * elapsed[1] / max(tick, 1),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seeds', type=int, default=3, help='games to compare')
+    parser.add_argument('--ticks', type=int, default=20000, help='ticks per game')
+    parser.add_argument('--cooldown', type=int, help='override the tower cooldown')
+    parser.add_argument('--damage', type=int, help='override the tower damage')
+    parser.add_argument('--immortal', action='store_true',
+                        help='keep the tower alive for the whole run')
+    parser.add_argument('--towers', type=int, default=0,
+                        help='extra towers placed around the main one')
+    parser.add_argument('--ledger', action='store_true',
+                        help='turn on the pending-damage ledger')
+    args = parser.parse_args()
+
+    failed = False
+    for seed in range(args.seeds):
+        report = validate(seed, args.ticks, args.cooldown, args.damage,
+                          args.immortal, args.towers, args.ledger)
+        ok = report['mismatched_kill_ticks'] == 0 and report['final_state_matches']
+        failed |= not ok
+        print(f"seed {seed}: {report['ticks']} ticks, {report['kills']} kills, "
+              f"{report['mismatched_kill_ticks']} mismatched kill ticks, "
+              f"{report['simulated_ms_per_tick']:.3f} ms/tick simulated vs "
+              f"{report['predicted_ms_per_tick']:.3f} ms/tick predicted"
+              + ('' if ok else f"\n  first mismatches: {report['mismatches']}"))
+    raise SystemExit(1 if failed else 0)
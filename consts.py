@@ -12,6 +12,10 @@ FPS = 60
 WAVE_INTERVAL = 10
 WAVE_PAUSE_TIME = 2
 
+# Spawning
+SPAWN_EXCLUSION_RADIUS = 400    # No spawns this close to the tower
+SPAWN_BUDGET_PER_TICK = 200     # Most enemies spawned in a single frame
+
 # Screen sizes
 SCREEN_WIDTH, SCREEN_HEIGHT = 1200, 800
 
@@ -21,3 +25,52 @@ TOWER_SIZE = 40
 
 # UI geometry
 HEALTHBAR_SIZE = 200
+
+# Sprite frame cache
+FRAME_ANGLE_STEP = 5            # Degrees between cached rotations
+FRAME_ALPHA_STEPS = 15          # Fade levels for death animations
+FRAME_CACHE_MAX_FRAMES = 2048   # Cached frames per sprite type
+
+# Frame profiler
+FRAME_BUDGET_MS = 1000 / FPS    # Time available per rendered frame
+PROFILER_HISTORY = 300          # Frames kept for histograms and the overlay
+PROFILER_MAX_RECORDS = 100000   # Frames kept for dumping on exit
+
+# Replays
+REPLAY_CHECKPOINT_INTERVAL = 60     # Ticks between recorded state checksums
+
+# Upgrade policy evaluation
+EVAL_MAX_TICKS = 60 * 60 * 10      # Longest evaluated game (10 minutes)
+EVAL_DECISION_INTERVAL = 30         # Ticks between policy decisions
+EVAL_CASH_SAMPLE_INTERVAL = 300     # Ticks between cash curve samples
+
+# Snapshots
+QUICKSAVE_PATH = 'quicksave.tdsv'   # F5 saves here, F9 loads it
+
+# Telemetry
+TELEMETRY_BUFFER_SIZE = 65536       # Events held before the oldest are dropped
+TELEMETRY_FLUSH_INTERVAL = 0.05     # Seconds between background drains
+
+# Fast-forward and fixed-timestep rendering
+SPEED_MULTIPLIERS = (1, 2, 4, 16)   # Keys 1-4 pick a simulation speed
+MAX_TICKS_PER_FRAME = 64            # Most simulation ticks run per frame
+SIM_BUDGET_MS = 0.75 * FRAME_BUDGET_MS  # Real time per frame spent on ticks
+MAX_FRAME_MS = 250                  # Longest frame time fed to the simulation
+
+# Point-cloud level of detail (see render.PointCloud)
+LOD_ENTITY_THRESHOLD = 3000         # Entities above which points replace sprites
+LOD_HYSTERESIS = 0.8                # Back to sprites below this share of it
+LOD_ENEMY_SIZE = 3                  # Side of an enemy's square stamp
+LOD_PROJECTILE_SIZE = 2             # Side of a projectile's square stamp
+LOD_ENEMY_COLOR = (220, 60, 60)
+LOD_DYING_COLOR = (130, 60, 60)
+LOD_PROJECTILE_COLOR = (255, 230, 120)
+
+# Assets
+SOUND_POOL_CHANNELS = 4             # Mixer channels reserved per pooled sound
+
+# Offline progress
+AUTOSAVE_PATH = 'autosave.tdsv'     # Saved on exit, resumed on launch
+OFFLINE_MAX_SECONDS = 24 * 60 * 60  # Longest absence that earns progress
+OFFLINE_EXACT_ENEMIES = 100_000     # Enemies modelled one by one before extrapolating
+OFFLINE_FIT_WAVES = 16              # Fewest damaging waves to extrapolate from
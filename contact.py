@@ -0,0 +1,151 @@
+'''Scheduled tower-contact checks for enemies closing in on the tower'''
+import heapq
+import numpy as np
+import consts
+
+# Checks start this many ticks before the predicted arrival, so rounding
+# in the per-frame movement can never let an enemy arrive unchecked
+ARRIVAL_MARGIN = 2
+
+
+def ticks_to_arrive(distance, speed):
+    '''
+    Movement steps until enemies at distance from the tower, closing at
+    speed per tick, are within reach of it. Enemies that never arrive get
+    -1.
+    '''
+    distance = np.asarray(distance, dtype=float)
+    speed = np.broadcast_to(np.asarray(speed, dtype=float), distance.shape)
+    gap = distance - consts.TOWER_SIZE
+    ticks = np.full(distance.shape, -1, dtype=np.int64)
+    moving = speed > 0
+    ticks[moving] = np.ceil(np.maximum(gap[moving], 0) / speed[moving])
+    ticks[gap <= 0] = 0
+    return ticks
+
+
+class ArrivalQueue:
+    '''
+    Priority queue of integer keys by the tick they may reach the tower.
+
+    Enemies walk straight at the fixed tower at a constant speed, so the
+    tick each one can first touch it is known when it spawns. Keys are
+    bucketed by check tick, and a heap of bucket ticks orders the buckets,
+    so a whole wave is scheduled with a few heap pushes. Callers validate
+    popped keys themselves; keys of enemies that died meanwhile are simply
+    ignored.
+    '''
+
+    def __init__(self):
+        self.tick = 0                   # Current tick, see advance()
+        self._ticks = []                # Heap of bucket ticks
+        self._buckets = {}              # Tick -> list of key arrays
+
+    def __len__(self):
+        return sum(len(keys) for bucket in self._buckets.values() for keys in bucket)
+
+    def advance(self):
+        '''Move on to the next tick'''
+        self.tick += 1
+
+    def schedule(self, keys, ticks):
+        '''
+        Queue keys for checking ARRIVAL_MARGIN ticks before they arrive,
+        ticks movement steps from now (and no sooner than the next tick).
+        Keys with negative ticks never arrive and are dropped.
+        '''
+        keys = np.asarray(keys, dtype=np.int64)
+        ticks = np.asarray(ticks, dtype=np.int64)
+        keep = ticks >= 0
+        keys = keys[keep]
+        if not len(keys):
+            return
+        due = self.tick + np.maximum(ticks[keep] - ARRIVAL_MARGIN, 1)
+
+        order = np.argsort(due, kind='stable')
+        due = due[order]
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, due[1:] != due[:-1]])
+        ends = np.r_[starts[1:], len(due)]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            tick = int(due[start])
+            bucket = self._buckets.get(tick)
+            if bucket is None:
+                bucket = self._buckets[tick] = []
+                heapq.heappush(self._ticks, tick)
+            bucket.append(keys[start:end])
+
+    def pop_due(self):
+        '''Keys whose check tick has come, as one array'''
+        due = []
+        while self._ticks and self._ticks[0] <= self.tick:
+            due.extend(self._buckets.pop(heapq.heappop(self._ticks)))
+        if not due:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(due)
+
+    def clear(self):
+        '''Drop every scheduled key'''
+        self._ticks.clear()
+        self._buckets.clear()
+
+
+class SpriteContacts:
+    '''
+    Tower-contact tracking for sprite Enemy objects.
+
+    Enemies are scheduled when they spawn; each tick only enemies whose
+    check tick has come get an exact touching_tower() test, and enemies
+    found touching are kept, once each, for contact damage. Enemies have
+    arrived set to False when scheduled and True once touching, which
+    stops their movement.
+    '''
+
+    def __init__(self):
+        self.queue = ArrivalQueue()
+        self._enemies = {}              # Scheduled key -> enemy
+        self._next_key = 0
+        self._near = {}                 # Enemies checked every tick, in order
+        self.touching = {}              # Enemies that reached the tower, in order
+
+    def add(self, enemies):
+        '''Schedule newly spawned enemies'''
+        if not enemies:
+            return
+        dx = consts.TOWER_X - np.array([enemy.x for enemy in enemies])
+        dy = consts.TOWER_Y - np.array([enemy.y for enemy in enemies])
+        speed = np.array([enemy.speed for enemy in enemies], dtype=float)
+        ticks = ticks_to_arrive(np.sqrt(dx * dx + dy * dy), speed)
+
+        keys = np.arange(self._next_key, self._next_key + len(enemies))
+        self._next_key += len(enemies)
+        for key, enemy, steps in zip(keys.tolist(), enemies, ticks.tolist()):
+            enemy.arrived = steps == 0
+            if enemy.arrived:
+                # A recycled enemy may still be listed from its earlier life
+                self.touching[enemy] = None
+            elif steps > 0:
+                self._enemies[key] = enemy
+        self.queue.schedule(keys[ticks > 0], ticks[ticks > 0])
+
+    def update(self):
+        '''Advance a tick and test the enemies due for a contact check'''
+        self.queue.advance()
+        for key in self.queue.pop_due().tolist():
+            enemy = self._enemies.pop(key)
+            self._near[enemy] = None
+
+        for enemy in list(self._near):
+            # Pooled enemies may have been recycled since being scheduled
+            if enemy.state != 'alive' or enemy.arrived is not False:
+                del self._near[enemy]
+            elif enemy.touching_tower():
+                del self._near[enemy]
+                enemy.arrived = True
+                self.touching[enemy] = None
+
+    def damage(self):
+        '''Total damage from living enemies touching the tower'''
+        self.touching = {enemy: None for enemy in self.touching
+                         if enemy.state == 'alive' and enemy.arrived}
+        return sum(enemy.damage for enemy in self.touching)
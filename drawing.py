@@ -0,0 +1,13 @@
+'''Sprite drawing helpers shared by the simulation stores'''
+
+
+def blit_group(group, surface, rects, special_flags=0):
+    '''
+    Group.draw() with each sprite blitted at the given rect instead of its
+    own, keeping the drawn rects for clear() and dirty-rect updates
+    '''
+    sprites = group.sprites()
+    group.spritedict.update(zip(sprites, surface.blits(
+        [(sprite.image, rect, None, special_flags) for sprite, rect in zip(sprites, rects)])))
+    group.lostsprites = []
+    return group.lostsprites
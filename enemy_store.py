@@ -0,0 +1,545 @@
+'''Array-backed enemy storage with vectorized update kernels'''
+import math
+import numpy as np
+import pygame
+import consts
+from spatial import SpatialGrid, round_center
+import assets
+import contact
+import drawing
+import pools
+
+# Enemy state codes
+FREE = -1
+ALIVE = 0
+DYING = 1
+DEAD = 2
+
+STATE_NAMES = {ALIVE: 'alive', DYING: 'dying', DEAD: 'dead'}
+
+# Arrival queue keys pack a slot and the low bits of its generation
+_GENERATION_BITS = 32
+_GENERATION_MASK = (1 << _GENERATION_BITS) - 1
+
+# Per-slot arrays saved in snapshots (generation is saved for every slot)
+SNAPSHOT_ARRAYS = ('x', 'y', 'health', 'damage', 'speed', 'bounty',
+                   'death_timer', 'death_duration', 'state', 'order')
+
+
+class EnemyStore:
+    '''
+    Struct-of-arrays store for every enemy in play
+
+    Each enemy occupies one slot across the parallel arrays below. update()
+    runs the same move/contact/death rules as Enemy.update() for all slots
+    at once, and each slot has a thin EnemyView sprite for drawing and for
+    code that expects Enemy objects (Tower targeting, projectiles).
+    '''
+
+    def __init__(self, capacity=256):
+        self.capacity = 0
+        self.count = 0                      # Occupied slots
+        self.top = 0                        # One past the highest used slot
+        self._free = []                     # Released slots below top
+        self.spawned = 0                    # Enemies spawned so far
+
+        # Spatial index over occupied slots, rebuilt lazily after movement
+        self.grid = SpatialGrid()
+        self._grid_dirty = True
+
+        # Scheduled tower-contact checks (see contact.ArrivalQueue)
+        self.arrivals = contact.ArrivalQueue()
+        self._near = np.zeros(0, dtype=np.int64)    # Keys checked every tick
+        self.arrived_count = 0                      # Slots touching the tower
+
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.prev_x = np.zeros(0)          # Positions before the last update,
+        self.prev_y = np.zeros(0)          # for interpolated drawing
+        self.health = np.zeros(0)
+        self.damage = np.zeros(0)
+        self.speed = np.zeros(0)
+        self.bounty = np.zeros(0)
+        self.death_timer = np.zeros(0, dtype=np.int32)
+        self.death_duration = np.zeros(0, dtype=np.int32)
+        self.state = np.zeros(0, dtype=np.int8)
+        self.generation = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.arrived = np.zeros(0, dtype=bool)
+        self.pending = np.zeros(0)          # Damage of shots in flight at each slot
+        self.ledger = False                 # Leave doomed enemies out of nearest()
+        self.views = []
+        self.view_pool = pools.ObjectPool(EnemyView)
+        self.render_alpha = 1.0             # Draw this far from prev to current
+
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        '''Resize every array to hold at least capacity slots'''
+        extra = capacity - self.capacity
+        if extra <= 0:
+            return
+
+        def extend(arr, fill=0):
+            return np.concatenate([arr, np.full(extra, fill, dtype=arr.dtype)])
+
+        self.x = extend(self.x)
+        self.y = extend(self.y)
+        self.prev_x = extend(self.prev_x)
+        self.prev_y = extend(self.prev_y)
+        self.health = extend(self.health)
+        self.damage = extend(self.damage)
+        self.speed = extend(self.speed)
+        self.bounty = extend(self.bounty)
+        self.death_timer = extend(self.death_timer)
+        self.death_duration = extend(self.death_duration)
+        self.state = extend(self.state, FREE)
+        self.generation = extend(self.generation)
+        self.order = extend(self.order)
+        self.arrived = extend(self.arrived)
+        self.pending = extend(self.pending)
+        self.views.extend([None] * extra)
+        self.capacity = capacity
+
+    def spawn(self, x, y, health=1, damage=1, speed=1, bounty=1,
+              death_duration=30):
+        '''Place a new enemy in a free slot and return its view'''
+        if self._free:
+            i = self._free.pop()
+        else:
+            if self.top == self.capacity:
+                self._grow(self.capacity * 2)
+            i = self.top
+            self.top += 1
+
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.health[i] = health
+        self.damage[i] = damage
+        self.speed[i] = speed
+        self.bounty[i] = bounty
+        self.death_timer[i] = 0
+        self.death_duration[i] = death_duration
+        self.pending[i] = 0
+        self.state[i] = ALIVE
+        self.generation[i] += 1
+        self.order[i] = self.spawned
+        self.spawned += 1
+        self.count += 1
+        self._grid_dirty = True
+        self._schedule_arrivals(np.array([i], dtype=np.intp))
+
+        view = self.view_pool.acquire(self, i)
+        self.views[i] = view
+        return view
+
+    def spawn_many(self, xs, ys, health=1, damage=1, speed=1, bounty=1,
+                   death_duration=30):
+        '''Place a batch of enemies at once and return their views'''
+        n = len(xs)
+        reused = min(n, len(self._free))
+        slots = [self._free.pop() for _ in range(reused)]
+        fresh = n - reused
+        if self.top + fresh > self.capacity:
+            self._grow(max(self.capacity * 2, self.top + fresh))
+        slots.extend(range(self.top, self.top + fresh))
+        self.top += fresh
+        slots = np.array(slots, dtype=np.intp)
+
+        self.x[slots] = self.prev_x[slots] = xs
+        self.y[slots] = self.prev_y[slots] = ys
+        self.health[slots] = health
+        self.damage[slots] = damage
+        self.speed[slots] = speed
+        self.bounty[slots] = bounty
+        self.death_timer[slots] = 0
+        self.death_duration[slots] = death_duration
+        self.pending[slots] = 0
+        self.state[slots] = ALIVE
+        self.generation[slots] += 1
+        self.order[slots] = np.arange(self.spawned, self.spawned + n)
+        self.spawned += n
+        self.count += n
+        self._grid_dirty = True
+        self._schedule_arrivals(slots)
+
+        return self._make_views(slots.tolist())
+
+    def release(self, i):
+        '''Free slot i for reuse'''
+        if self.state[i] == FREE:
+            return
+        self.state[i] = FREE
+        if self.arrived[i]:
+            self.arrived[i] = False
+            self.arrived_count -= 1
+        view = self.views[i]
+        self.views[i] = None
+        self.count -= 1
+        self._grid_dirty = True
+        if view is not None:
+            self.view_pool.release(view)
+
+        if self.count == 0:
+            # Store is empty, start packing from the bottom again
+            self.top = 0
+            self._free.clear()
+        else:
+            self._free.append(i)
+
+    def _schedule_arrivals(self, slots):
+        '''Queue contact checks for freshly placed enemies'''
+        self.arrived[slots] = False
+        dx = consts.TOWER_X - self.x[slots]
+        dy = consts.TOWER_Y - self.y[slots]
+        ticks = contact.ticks_to_arrive(np.sqrt(dx * dx + dy * dy), self.speed[slots])
+
+        # Enemies placed within reach touch the tower straight away
+        now = slots[ticks == 0]
+        self.arrived[now] = True
+        self.arrived_count += len(now)
+
+        later = ticks > 0
+        self.arrivals.schedule(self._keys(slots[later]), ticks[later])
+
+    def _keys(self, slots):
+        return (slots.astype(np.int64) << _GENERATION_BITS) | (
+            self.generation[slots] & _GENERATION_MASK)
+
+    def _check_arrivals(self):
+        '''Exact reach test for enemies whose scheduled check has come'''
+        keys = self.arrivals.pop_due()
+        if len(self._near):
+            keys = np.concatenate([self._near, keys])
+        if len(keys) == 0:
+            return
+
+        # Drop keys of enemies that have died or been replaced
+        slots = (keys >> _GENERATION_BITS).astype(np.intp)
+        current = ((self.state[slots] == ALIVE) &
+                   ((self.generation[slots] & _GENERATION_MASK) ==
+                    (keys & _GENERATION_MASK)))
+        keys = keys[current]
+        slots = slots[current]
+
+        dx = consts.TOWER_X - self.x[slots]
+        dy = consts.TOWER_Y - self.y[slots]
+        touching = np.sqrt(dx * dx + dy * dy) <= consts.TOWER_SIZE
+        self.arrived[slots[touching]] = True
+        self.arrived_count += int(touching.sum())
+        self._near = keys[~touching]
+
+    def update(self):
+        '''Advance every enemy one frame (vectorized Enemy.update)'''
+        n = self.top
+        state = self.state[:n]
+        x = self.x[:n]
+        y = self.y[:n]
+        self.prev_x[:n] = x
+        self.prev_y[:n] = y
+        self.arrivals.advance()
+
+        # Move living enemies that are not yet against the tower
+        alive = state == ALIVE
+        dx = consts.TOWER_X - x
+        dy = consts.TOWER_Y - y
+        dist = np.sqrt(dx * dx + dy * dy)
+        moving = alive & ~self.arrived[:n]
+        x += np.divide(dx, dist, out=np.zeros(n), where=moving) * self.speed[:n]
+        y += np.divide(dy, dist, out=np.zeros(n), where=moving) * self.speed[:n]
+        self._grid_dirty = True
+        self._check_arrivals()
+
+        # Advance death animations
+        dying = state == DYING
+        timer = self.death_timer[:n]
+        timer += dying
+        state[dying & (timer >= self.death_duration[:n])] = DEAD
+
+        # Enemies killed last frame start dying
+        killed = alive & (self.health[:n] <= 0)
+        state[killed] = DYING
+        timer[killed] = 0
+
+    def snapshot(self):
+        '''Counters and packed arrays that fully describe the store'''
+        counters = {'capacity': self.capacity, 'count': self.count,
+                    'top': self.top, 'spawned': self.spawned}
+        arrays = [getattr(self, name)[:self.top] for name in SNAPSHOT_ARRAYS]
+        arrays.append(self.generation)
+        arrays.append(np.array(self._free, dtype=np.int64))
+        return counters, arrays
+
+    def restore(self, counters, arrays):
+        '''
+        Load a snapshot into this (empty) store. Returns the new views in
+        spawn order, for adding to sprite groups.
+        '''
+        self._grow(counters['capacity'])
+        top = counters['top']
+        for name, values in zip(SNAPSHOT_ARRAYS, arrays):
+            getattr(self, name)[:top] = values
+        self.generation[:] = arrays[len(SNAPSHOT_ARRAYS)]
+        self._free = arrays[len(SNAPSHOT_ARRAYS) + 1].tolist()
+        self.prev_x[:top] = self.x[:top]
+        self.prev_y[:top] = self.y[:top]
+        self.pending[:] = 0                 # Rebuilt by ProjectileStore.restore()
+        self.top = top
+        self.count = counters['count']
+        self.spawned = counters['spawned']
+        self._grid_dirty = True
+        self._schedule_arrivals(np.flatnonzero(self.state[:top] == ALIVE))
+
+        slots = np.flatnonzero(self.state[:top] != FREE)
+        slots = slots[np.argsort(self.order[slots], kind='stable')]
+        return self._make_views(slots.tolist())
+
+    def _make_views(self, slots):
+        '''Views for a batch of filled slots, in the given order'''
+        views = self.view_pool.acquire_many([(self, i) for i in slots])
+        store_views = self.views
+        for i, view in zip(slots, views):
+            store_views[i] = view
+        return views
+
+    def nearest(self, pos, radius):
+        '''
+        Closest living enemy whose rect center is within radius of pos, or
+        None. Ties go to the earliest spawned, as with a linear group scan.
+        With ledger on, enemies that shots in flight will kill are skipped.
+        '''
+        self._build_grid()
+
+        # Rect centers are rounded, so widen the cell search by a pixel
+        cx, cy = pos
+        slots = self.grid.query(cx, cy, radius + 1)
+        slots = slots[self._targetable(slots)]
+        if len(slots) == 0:
+            return None
+
+        dx = round_center(self.x[slots]) - cx
+        dy = round_center(self.y[slots]) - cy
+        dist_sq = dx * dx + dy * dy
+        in_range = dist_sq <= radius * radius
+        if not in_range.any():
+            return None
+
+        slots = slots[in_range]
+        dist_sq = dist_sq[in_range]
+        closest = slots[dist_sq == dist_sq.min()]
+        return self.views[closest[np.argmin(self.order[closest])]]
+
+    def nearest_many(self, xs, ys, radii):
+        '''
+        nearest() for many positions in one grid query. Returns the slot of
+        the closest living enemy in range of each position, or -1.
+        '''
+        self._build_grid()
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        radii = np.broadcast_to(np.asarray(radii, dtype=float), xs.shape)
+        nearest = np.full(len(xs), -1, dtype=np.intp)
+
+        owner, slots = self.grid.query_many(xs, ys, radii + 1)
+        living = self._targetable(slots)
+        owner = owner[living]
+        slots = slots[living]
+        dx = round_center(self.x[slots]) - xs[owner]
+        dy = round_center(self.y[slots]) - ys[owner]
+        dist_sq = dx * dx + dy * dy
+        in_range = dist_sq <= radii[owner] * radii[owner]
+        owner = owner[in_range]
+        slots = slots[in_range]
+        if len(slots) == 0:
+            return nearest
+
+        # Closest first, ties to the earliest spawned, then the first per owner
+        order = np.lexsort((self.order[slots], dist_sq[in_range], owner))
+        owner = owner[order]
+        firsts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        nearest[owner[firsts]] = slots[order][firsts]
+        return nearest
+
+    def _targetable(self, slots):
+        '''Mask of slots that can be targeted: alive, and not doomed if ledger is on'''
+        health = self.health[slots]
+        living = (self.state[slots] == ALIVE) & (health > 0)
+        if self.ledger:
+            living &= health > self.pending[slots]
+        return living
+
+    def _build_grid(self):
+        '''Rebuild the spatial index if enemies moved or changed since'''
+        if self._grid_dirty:
+            self.grid.build(self.x, self.y,
+                            np.flatnonzero(self.state[:self.top] != FREE))
+            self._grid_dirty = False
+
+    def touching_tower(self):
+        '''Boolean mask of living enemies within reach of the tower'''
+        n = self.top
+        return (self.state[:n] == ALIVE) & self.arrived[:n]
+
+    def contact_damage(self):
+        '''Total damage dealt to the tower by enemies touching it'''
+        if self.arrived_count == 0:
+            return 0.0
+        return float(self.damage[:self.top][self.touching_tower()].sum())
+
+    def dead(self):
+        '''Views of enemies whose death animation has finished'''
+        return [self.views[i] for i in np.flatnonzero(self.state[:self.top] == DEAD)]
+
+    def points(self):
+        '''
+        Pixel centers of the living and dying enemies, interpolated by
+        render_alpha, and a mask of which are dying
+        '''
+        state = self.state[:self.top]
+        slots = np.flatnonzero((state == ALIVE) | (state == DYING))
+        alpha = self.render_alpha
+        x = self.prev_x[slots] + (self.x[slots] - self.prev_x[slots]) * alpha
+        y = self.prev_y[slots] + (self.y[slots] - self.prev_y[slots]) * alpha
+        return round_center(x), round_center(y), state[slots] == DYING
+
+
+class EnemyGroup(pygame.sprite.Group):
+    '''Sprite group of EnemyViews that answers range queries via its store'''
+
+    def __init__(self, store, *sprites):
+        super().__init__(*sprites)
+        self.store = store
+
+    def nearest(self, pos, radius):
+        '''Closest living enemy within radius of pos, or None'''
+        return self.store.nearest(pos, radius)
+
+    def assign_targets(self, towers):
+        '''
+        Give every tower without a valid target the closest living enemy in
+        its range, with one batched query for all of them
+        '''
+        needy = [tower for tower in towers if not tower.has_valid_target()]
+        if not needy:
+            return
+        slots = self.store.nearest_many([tower.pos[0] for tower in needy],
+                                        [tower.pos[1] for tower in needy],
+                                        [tower.range for tower in needy])
+        views = self.store.views
+        for tower, slot in zip(needy, slots.tolist()):
+            tower.current_target = views[slot] if slot >= 0 else None
+
+    def draw(self, surface, bgsurf=None, special_flags=0):
+        '''Draw at positions interpolated by the store's render_alpha'''
+        store = self.store
+        if store.render_alpha >= 1.0:
+            return super().draw(surface, bgsurf, special_flags)
+        sprites = self.sprites()
+        slots = np.fromiter((sprite.index for sprite in sprites), np.intp, len(sprites))
+        alpha = store.render_alpha
+        x = store.prev_x[slots] + (store.x[slots] - store.prev_x[slots]) * alpha
+        y = store.prev_y[slots] + (store.y[slots] - store.prev_y[slots]) * alpha
+        rects = [pygame.Rect(left, top, 20, 20) for left, top in
+                 zip((round_center(x) - 10).tolist(), (round_center(y) - 10).tolist())]
+
+        # Dying frames are rotated and change size, so center them as well
+        for k in np.flatnonzero(store.death_timer[slots] > 0).tolist():
+            rects[k] = sprites[k].image.get_rect(center=(x[k], y[k]))
+        return drawing.blit_group(self, surface, rects, special_flags)
+
+
+class EnemyView(pygame.sprite.Sprite):
+    '''Sprite-compatible handle onto one EnemyStore slot'''
+
+    __slots__ = ('store', 'index', 'assets', 'pool', '_pooled')
+
+    def __init__(self, store, index):
+        super().__init__()
+        self.pool = None
+        self._pooled = False
+        self.reset(store, index)
+
+    def reset(self, store, index):
+        '''Point this view at a store slot'''
+        self.store = store
+        self.index = index
+        self.assets = assets.get('enemy')
+
+    @property
+    def x(self):
+        return float(self.store.x[self.index])
+
+    @property
+    def y(self):
+        return float(self.store.y[self.index])
+
+    @property
+    def health(self):
+        return float(self.store.health[self.index])
+
+    @health.setter
+    def health(self, value):
+        self.store.health[self.index] = value
+
+    @property
+    def damage(self):
+        return float(self.store.damage[self.index])
+
+    @property
+    def pending_damage(self):
+        return float(self.store.pending[self.index])
+
+    @pending_damage.setter
+    def pending_damage(self, value):
+        self.store.pending[self.index] = value
+
+    @property
+    def speed(self):
+        return float(self.store.speed[self.index])
+
+    @property
+    def bounty(self):
+        return int(self.store.bounty[self.index])
+
+    @property
+    def state(self):
+        return STATE_NAMES[self.store.state[self.index]]
+
+    @property
+    def death_timer(self):
+        return int(self.store.death_timer[self.index])
+
+    @property
+    def image(self):
+        '''Base image rotated to face the tower, faded while dying'''
+        angle = math.degrees(math.atan2(-(consts.TOWER_Y - self.y),
+                                        consts.TOWER_X - self.x))
+        alpha = 255
+        if self.store.state[self.index] != ALIVE:
+            duration = self.store.death_duration[self.index]
+            alpha = max(0, 255 * (1 - self.death_timer / duration))
+        return self.assets.frames.frame(angle, alpha)
+
+    @property
+    def rect(self):
+        if self.store.death_timer[self.index] > 0:
+            # Like Enemy._animate_death, center on the rotated, faded frame
+            return self.image.get_rect(center=(self.x, self.y))
+        rect = pygame.Rect(0, 0, 20, 20)
+        rect.center = (self.x, self.y)
+        return rect
+
+    def touching_tower(self):
+        '''Returns True if within the distance of the tower size'''
+        dx = consts.TOWER_X - self.x
+        dy = consts.TOWER_Y - self.y
+        return (dx**2 + dy**2)**0.5 <= consts.TOWER_SIZE
+
+    def kill(self):
+        '''Remove from all groups and release the store slot'''
+        super().kill()
+        if self.store.views[self.index] is self:
+            self.store.release(self.index)
+
+    def update(self):
+        '''Movement is handled in bulk by EnemyStore.update()'''
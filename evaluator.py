@@ -0,0 +1,213 @@
+'''
+Monte Carlo evaluation of scripted upgrade policies
+
+Plays many headless games per policy, each with its own seed, across a
+process pool and summarizes waves reached, time to death and cash over
+time for each policy:
+
+    python evaluator.py --games 1000
+    python evaluator.py --policy damage --policy cheapest --output eval.json
+
+Workers import the game once when they start rather than per game, and
+games are handed out in chunks so inter-process
+traffic stays small next to the simulation work.
+'''
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import consts
+import game_manager
+
+UPGRADES = ('damage', 'speed', 'armor')
+
+
+def _buy(game, upgrade):
+    '''Buy an upgrade if it's affordable, without the failure message'''
+    if upgrade == 'speed' and game.tower.cooldown <= 5:
+        return False
+    if game.cash < game.upgrade_costs()[upgrade]:
+        return False
+    return getattr(game, f'upgrade_tower_{upgrade}')()
+
+
+def policy_none(game, state):
+    '''Never upgrade'''
+
+
+def policy_damage(game, state):
+    '''Spend everything on damage'''
+    while _buy(game, 'damage'):
+        pass
+
+
+def policy_speed(game, state):
+    '''Spend everything on attack speed, then damage once speed is maxed'''
+    while _buy(game, 'speed') or (game.tower.cooldown <= 5 and _buy(game, 'damage')):
+        pass
+
+
+def policy_armor(game, state):
+    '''Spend everything on armor'''
+    while _buy(game, 'armor'):
+        pass
+
+
+def policy_cheapest(game, state):
+    '''Always buy the cheapest available upgrade'''
+    while True:
+        costs = game.upgrade_costs()
+        if game.tower.cooldown <= 5:
+            del costs['speed']
+        if not _buy(game, min(costs, key=costs.get)):
+            break
+
+
+def policy_round_robin(game, state):
+    '''Cycle damage, speed, armor, waiting to afford each in turn'''
+    while _buy(game, UPGRADES[state.get('next', 0)]):
+        state['next'] = (state.get('next', 0) + 1) % len(UPGRADES)
+
+
+def policy_saver(game, state):
+    '''Wait for twice the cheapest upgrade's cost, then buy cheapest upgrades'''
+    costs = game.upgrade_costs()
+    if game.cash >= 2 * min(costs.values()):
+        policy_cheapest(game, state)
+
+
+POLICIES = {
+    'none': policy_none,
+    'damage': policy_damage,
+    'speed': policy_speed,
+    'armor': policy_armor,
+    'cheapest': policy_cheapest,
+    'round_robin': policy_round_robin,
+    'saver': policy_saver,
+}
+
+
+def play(policy_name, seed, max_ticks=consts.EVAL_MAX_TICKS,
+         decision_interval=consts.EVAL_DECISION_INTERVAL,
+         sample_interval=consts.EVAL_CASH_SAMPLE_INTERVAL):
+    '''Play one headless game under a policy and return its outcome'''
+    policy = POLICIES[policy_name]
+    state = {}
+
+    game = game_manager.GameManager(seed=seed)
+    game.start_game()
+    cash = []
+    ticks = 0
+    while ticks < max_ticks and not game.game_over:
+        if ticks % decision_interval == 0:
+            policy(game, state)
+        if ticks % sample_interval == 0:
+            cash.append(game.cash)
+        game.update()
+        ticks += 1
+
+    return {
+        'policy': policy_name,
+        'seed': seed,
+        'wave': game.wave_number,
+        'ticks': ticks,
+        'died': game.game_over,
+        'cash': cash,
+        'upgrades': {'damage': game.tower.damage, 'cooldown': game.tower.cooldown,
+                     'max_health': game.tower.max_health},
+    }
+
+
+def _play_task(task):
+    return play(*task)
+
+
+def evaluate(policies, games, base_seed=0, workers=None,
+             max_ticks=consts.EVAL_MAX_TICKS):
+    '''
+    Play games games per policy across a process pool.
+
+    Every policy sees the same seeds, so policies are compared on the same
+    spawn sequences. Returns the list of per-game outcomes.
+    '''
+    workers = workers or os.cpu_count() or 1
+    tasks = [(name, base_seed + i, max_ticks) for name in policies
+             for i in range(games)]
+    # A few chunks per worker balances load without much pickling traffic
+    chunksize = max(1, math.ceil(len(tasks) / (workers * 4)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_play_task, tasks, chunksize=chunksize))
+
+
+def summarize(results, fps=consts.FPS, sample_interval=consts.EVAL_CASH_SAMPLE_INTERVAL):
+    '''Per-policy aggregates of a list of game outcomes'''
+    by_policy = {}
+    for result in results:
+        by_policy.setdefault(result['policy'], []).append(result)
+
+    summary = {}
+    for name, outcomes in by_policy.items():
+        waves = np.array([r['wave'] for r in outcomes])
+        deaths = [r['ticks'] / fps for r in outcomes if r['died']]
+
+        # Cash curves end at death; hold the last value so every game
+        # contributes to every sample
+        length = max(len(r['cash']) for r in outcomes)
+        curves = np.array([r['cash'] + [r['cash'][-1]] * (length - len(r['cash']))
+                           for r in outcomes], dtype=float)
+
+        summary[name] = {
+            'games': len(outcomes),
+            'wave_mean': round(float(waves.mean()), 3),
+            'wave_p10': float(np.percentile(waves, 10)),
+            'wave_p50': float(np.percentile(waves, 50)),
+            'wave_p90': float(np.percentile(waves, 90)),
+            'wave_max': int(waves.max()),
+            'death_rate': round(len(deaths) / len(outcomes), 4),
+            'death_time_mean_s': round(float(np.mean(deaths)), 2) if deaths else None,
+            'cash_curve_interval_s': sample_interval / fps,
+            'cash_curve_mean': [round(float(v), 1) for v in curves.mean(axis=0)],
+        }
+    return summary
+
+
+def print_table(summary):
+    '''Print the summary as a table, best policy first'''
+    print(f"{'policy':<14}{'games':>7}{'wave':>8}{'p10':>6}{'p50':>6}{'p90':>6}"
+          f"{'max':>6}{'died':>7}{'death s':>9}{'final $':>9}")
+    for name, s in sorted(summary.items(), key=lambda item: -item[1]['wave_mean']):
+        death = f"{s['death_time_mean_s']:.1f}" if s['death_time_mean_s'] is not None else '-'
+        print(f"{name:<14}{s['games']:>7}{s['wave_mean']:>8.2f}{s['wave_p10']:>6.0f}"
+              f"{s['wave_p50']:>6.0f}{s['wave_p90']:>6.0f}{s['wave_max']:>6}"
+              f"{s['death_rate']:>7.0%}{death:>9}{s['cash_curve_mean'][-1]:>9.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--policy', action='append', choices=list(POLICIES),
+                        help='policy to evaluate (repeatable, default: all)')
+    parser.add_argument('--games', type=int, default=200,
+                        help='games per policy')
+    parser.add_argument('--seed', type=int, default=0, help='first game seed')
+    parser.add_argument('--workers', type=int, help='worker processes (default: all cores)')
+    parser.add_argument('--max-ticks', type=int, default=consts.EVAL_MAX_TICKS,
+                        help='stop games that survive this long')
+    parser.add_argument('--output', help='write the summary as JSON to this file')
+    args = parser.parse_args()
+
+    policies = args.policy or list(POLICIES)
+    start = time.perf_counter()
+    results = evaluate(policies, args.games, args.seed, args.workers, args.max_ticks)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results)
+    print_table(summary)
+    print(f'{len(results)} games in {elapsed:.1f}s ({len(results) / elapsed:.1f} games/s)')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
@@ -1,14 +1,73 @@
+import numpy as np
 import pygame as pg
-import random
+import assets
+import combat
 import consts
+import contact
+import pools
+from profiler import FrameProfiler
+import replay
+import spawner
+import telemetry
 import units
+from enemy_store import EnemyGroup, EnemyStore
+from projectile_store import ProjectileGroup, ProjectileStore
+from sim_clock import SimClock, WallClock
 
 
 class GameManager:
-    '''Centralized game state manager'''
+    '''
+    Centralized game state manager
 
-    def __init__(self, screen):
+    Pass screen=None to run headless: no drawing, and timing comes from a
+    fixed-timestep SimClock so update() advances exactly one tick.
+
+    enemy_engine selects how enemies are simulated: 'array' keeps them in
+    an EnemyStore updated in bulk, 'sprite' runs one Enemy.update() each.
+    projectile_engine does the same for shots; the array projectile engine
+    needs the array enemy engine, since shots target store slots. 'event'
+    skips projectile simulation for headless games and applies each shot's
+    damage at its predicted impact tick (see combat.py).
+
+    spawn_budget caps how many enemies spawn per tick; larger waves
+    stream in over several ticks. None spawns each wave in one tick.
+
+    profiler, if given, gets a lap() after each update phase.
+
+    seed fixes the game's random number generator, which all spawning
+    draws from; with a SimClock two games with the same seed and inputs
+    play out identically. None picks a fresh seed.
+
+    telemetry is the telemetry.EventBus that kills, spawns, upgrades, tower
+    damage and game over are reported to. By default events are discarded.
+
+    ledger makes towers skip enemies that shots already in flight will
+    kill, and redirects (or retires) shots whose target died before they
+    landed, so fewer shots are wasted on overkill. shot_stats() reports
+    how shots ended up.
+    '''
+
+    def __init__(self, screen=None, clock=None, enemy_engine='array',
+                 projectile_engine='array',
+                 spawn_budget=consts.SPAWN_BUDGET_PER_TICK, profiler=None,
+                 seed=None, telemetry_bus=None, ledger=True):
         self.screen = screen
+        self.headless = screen is None
+        self.profiler = profiler if profiler is not None else FrameProfiler()
+        self.telemetry = (telemetry_bus if telemetry_bus is not None
+                          else telemetry.EventBus())
+        self.recorder = None            # Input recorder, see start_recording()
+
+        # Random number generator owned by the game
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+        # Simulation clock (real time when rendering, fixed ticks headless)
+        if clock is None:
+            clock = SimClock() if self.headless else WallClock()
+        self.clock = clock
 
         # Game state
         self.running = False
@@ -19,63 +78,213 @@ class GameManager:
         self.cash = 100
         self.wave_number = 0
 
+        # Enemy simulation backend
+        self.ledger = ledger
+        self.enemy_engine = enemy_engine
+        self.enemy_store = EnemyStore() if enemy_engine == 'array' else None
+        self.projectile_engine = projectile_engine
+        self.projectile_store = None
+        self.combat = None
+        if projectile_engine == 'array' and self.enemy_store is not None:
+            self.projectile_store = ProjectileStore(self.enemy_store)
+        elif projectile_engine == 'event':
+            if self.enemy_store is None or not self.headless:
+                raise ValueError('event combat needs the array enemy engine '
+                                 'and a headless game')
+            self.combat = combat.ImpactScheduler(self.enemy_store)
+        if self.enemy_store is not None:
+            self.enemy_store.ledger = ledger
+        if self.projectile_store is not None:
+            self.projectile_store.retarget = ledger
+
         # Sprite groups
-        self.enemies = pg.sprite.Group()
-        self.projectiles = pg.sprite.Group()
+        if self.enemy_store is not None:
+            self.enemies = EnemyGroup(self.enemy_store)
+        else:
+            self.enemies = pg.sprite.Group()
+        if self.projectile_store is not None:
+            self.projectiles = ProjectileGroup(self.projectile_store)
+        elif self.combat is not None:
+            self.projectiles = combat.ImpactGroup(self.combat)
+        else:
+            self.projectiles = pg.sprite.Group()
         self.all_sprites = pg.sprite.Group()
+        self.enemy_pool = pools.ObjectPool(units.Enemy)
+
+        # Scheduled tower contact for sprite enemies (the store has its own)
+        self.contacts = contact.SpriteContacts() if self.enemy_store is None else None
 
         # Tower
+        # Shot sound, for games with a screen
+        self.shot_sound = assets.sound_pool('shot') if screen is not None else None
+
         self.tower = units.Tower(
             screen,
-            cash=self.cash
+            cash=self.cash,
+            ledger=ledger,
+            attack_sound=self.shot_sound
         )
+        self.towers = [self.tower]      # The main tower, then any added ones
 
         # Wave management
-        self.last_wave_time = pg.time.get_ticks()
+        self.spawner = spawner.WaveSpawner(
+            spawner.SpawnRegion(self.tower.pos), budget=spawn_budget,
+            rng=self.rng)
+        self.last_wave_time = self.clock.get_ticks()
         self.wave_interval_ms = int(consts.WAVE_INTERVAL * 1000)
         self.wave_pause_ms = int(consts.WAVE_PAUSE_TIME * 1000)
         self.waiting_for_next_wave = False
 
     def start_game(self):
         """Start the game loop"""
+        self._record('start_game')
         self.running = True
         self.paused = False
         self.game_over = False
 
         self._spawn_next_wave()
 
+    def run_ticks(self, n):
+        '''Run up to n simulation ticks, stopping early on game over'''
+        if not self.running:
+            self.start_game()
+
+        ticks = 0
+        while ticks < n and not self.game_over:
+            self._profiled_update()
+            ticks += 1
+        return ticks
+
+    def run_until_wave(self, wave, max_ticks=None):
+        '''Run until the given wave has spawned. Returns True if reached'''
+        if not self.running:
+            self.start_game()
+
+        ticks = 0
+        while self.wave_number < wave and not self.game_over:
+            if max_ticks is not None and ticks >= max_ticks:
+                break
+            self._profiled_update()
+            ticks += 1
+        return self.wave_number >= wave
+
+    def _profiled_update(self):
+        '''One update as a whole profiler frame, for runs without a main loop'''
+        self.profiler.begin_frame()
+        self.update()
+        self.profiler.end_frame()
+
+    def start_recording(self, path):
+        '''Stream this game's inputs to a replay file at path'''
+        if not isinstance(self.clock, SimClock):
+            raise ValueError('recording needs a SimClock for tick-based timing')
+        self.recorder = replay.ReplayRecorder(path, self.replay_config())
+        return self.recorder
+
+    def replay_config(self):
+        '''Settings a replay needs to rebuild this game from scratch'''
+        return {
+            'seed': self.seed,
+            'fps': self.clock.fps,
+            'enemy_engine': self.enemy_engine,
+            'projectile_engine': self.projectile_engine,
+            'spawn_budget': self.spawner.budget,
+            'ledger': self.ledger,
+        }
+
+    def _record(self, name):
+        if self.recorder is not None:
+            self.recorder.record(name)
+
     def update(self):
         '''Main update loop. Called every frame'''
+        if self.recorder is not None:
+            self.recorder.on_tick(self)
+        self.clock.tick()
 
         if self.paused or self.game_over:
             return
 
+        profiler = self.profiler
+
         # Update all game entities
         self._update_entities()
+        profiler.lap('entities')
 
         # Check for wave spawning
         self._check_wave_spawning()
+        profiler.lap('spawning')
 
         # Process collisions and interactions
         self._process_interactions()
+        profiler.lap('interactions')
 
         # Check win/lose conditions
         self._check_game_state()
+        profiler.lap('game_state')
 
         # Sync tower cash with game manager
         self.tower.cash = self.cash
 
     def _update_entities(self):
         """Update all game entities"""
-        self.enemies.update()
-        self.projectiles.update()
-        self.tower.update(self.enemies, self.projectiles)
+        if self.enemy_store is not None:
+            self.enemy_store.update()
+            dead = self.enemy_store.dead()
+        else:
+            self.enemies.update()
+            self.contacts.update()
+            dead = [enemy for enemy in self.enemies if enemy.state == 'dead']
+
+        # Clean up dead enemies and award cash before anything targets them
+        for enemy in dead:
+            self._handle_enemy_death(enemy)
+
+        if self.projectile_store is not None:
+            self.projectile_store.update()
+        elif self.combat is not None:
+            self.combat.update()
+        else:
+            self.projectiles.update(self.enemies if self.ledger else None)
+        self._update_towers()
+
+    def _update_towers(self):
+        '''Retarget every tower in one batched query where possible, then fire'''
+        targeted = hasattr(self.enemies, 'assign_targets')
+        if targeted:
+            self.enemies.assign_targets(self.towers)
+        for tower in self.towers:
+            tower.update(self.enemies, self.projectiles, targeted=targeted)
+
+    def add_tower(self, pos, damage=1, range=200, cooldown=30):
+        '''
+        Place an extra tower at pos. Extra towers only shoot: enemies still
+        walk at, and damage, the main tower, and upgrades apply to it alone.
+        '''
+        tower = units.Tower(self.screen, damage=damage, range=range,
+                            cooldown=cooldown, pos=pos, ledger=self.ledger,
+                            attack_sound=self.shot_sound,
+                            projectile_pool=self.tower.projectile_pool)
+        self.towers.append(tower)
+        return tower
+
+    def add_tower_ring(self, count, radius, **stats):
+        '''Place count extra towers evenly around the main tower, radius away'''
+        cx, cy = self.tower.pos
+        angles = np.linspace(0, 2 * np.pi, count, endpoint=False)
+        return [self.add_tower((cx + radius * np.cos(a), cy + radius * np.sin(a)), **stats)
+                for a in angles.tolist()]
 
     def _check_wave_spawning(self):
         """Handle wave spawning logic"""
-        now = pg.time.get_ticks()
+        now = self.clock.get_ticks()
         time_since_wave = now - self.last_wave_time
 
+        # Stream in any enemies still queued from the current wave
+        if self.spawner.pending:
+            self._spawn_pending()
+            return
+
         # Check if we should spawn a new wave
         if len(self.enemies) == 0:
             if not self.waiting_for_next_wave:
@@ -91,130 +300,196 @@ class GameManager:
     def _spawn_next_wave(self):
         """Spawn the next wave of enemies"""
         self.wave_number += 1
-        enemy_count = 20 + self.wave_number * 5
-
-        print(f"Spawning wave {self.wave_number} with {enemy_count} enemies")
-
-        self._spawn_wave(
-            self.enemies,
-            self.all_sprites,
-            self.tower,
-            count=enemy_count)
-
-    def _spawn_wave(self, enemies_group, all_sprites_group, tower, count=20):
-        '''Spawns a wave of enemies around the tower, avoiding spawn range'''
-        for _ in range(count):
-            # your current random spawn but using Enemy sprite
-            rand_x = random.randint(-int(0.5 * consts.SCREEN_WIDTH),
-                                    int(1.5 * consts.SCREEN_WIDTH))
-            rand_y = random.randint(-int(0.5 * consts.SCREEN_HEIGHT),
-                                    int(1.5 * consts.SCREEN_HEIGHT))
-            enemy = units.Enemy(rand_x, rand_y)
-            while ((tower.pos[0] - enemy.x)**2 +
-                   (tower.pos[1] - enemy.y)**2)**0.5 <= 400:
-                # re-roll until out of spawn range
-                rand_x = random.randint(-int(0.5 * consts.SCREEN_WIDTH),
-                                        int(1.5 * consts.SCREEN_WIDTH))
-                rand_y = random.randint(-int(0.5 * consts.SCREEN_HEIGHT),
-                                        int(1.5 * consts.SCREEN_HEIGHT))
-                enemy.x, enemy.y = rand_x, rand_y
-                enemy.rect.center = (rand_x, rand_y)
-            enemies_group.add(enemy)
-            all_sprites_group.add(enemy)
+        enemy_count = self.wave_size(self.wave_number)
 
-    def _process_interactions(self):
-        """Handle interactions between game entities"""
-        # Check for enemies attacking the tower
-        for enemy in self.enemies:
-            if enemy.state == 'alive' and enemy.touching_tower():
-                self._enemy_attack_tower(enemy)
+        self.telemetry.emit('wave_spawned', wave=self.wave_number, count=enemy_count)
 
-        # Clean up dead enemies and award cash
-        for enemy in list(self.enemies):
-            if enemy.state == 'dead' or not enemy.alive():
-                self._handle_enemy_death(enemy)
+        self.spawner.queue(enemy_count)
+        self._spawn_pending()
 
-    def _enemy_attack_tower(self, enemy):
-        """Handle enemy attacking the tower"""
-        self.tower.health -= enemy.damage
+    @staticmethod
+    def wave_size(wave):
+        '''Number of enemies in the given wave'''
+        return 20 + wave * 5
+
+    def _spawn_pending(self):
+        '''Spawns this tick's batch of queued enemies around the tower'''
+        xs, ys = self.spawner.take()
+        if self.enemy_store is not None:
+            enemies = self.enemy_store.spawn_many(xs, ys)
+        else:
+            enemies = [self.enemy_pool.acquire(x, y)
+                       for x, y in zip(xs.tolist(), ys.tolist())]
+            self.contacts.add(enemies)
+        self.enemies.add(enemies)
+        self.all_sprites.add(enemies)
+
+    def shot_stats(self):
+        '''
+        How fired shots ended up: hits on living enemies, overkill hits on
+        enemies already dead, and shots lost without hitting anything, with
+        the wasted (overkill or lost) percentage. Needs the array or event
+        projectile engine.
+        '''
+        shots = self.projectile_store or self.combat
+        if shots is None:
+            raise ValueError('shot stats need the array or event projectile engine')
+        lost = getattr(shots, 'lost', 0) + getattr(shots, 'misses', 0)
+        wasted = shots.overkill + lost
+        return {
+            'fired': shots.fired,
+            'hits': shots.hits,
+            'overkill': shots.overkill,
+            'lost': lost,
+            'retargeted': getattr(shots, 'retargeted', 0),
+            'wasted_pct': round(100 * wasted / max(shots.fired, 1), 2),
+        }
+
+    def pool_stats(self):
+        '''
+        Size, usage and high-water marks of every entity pool. All towers
+        share the main tower's projectile pool.
+        '''
+        stats = {
+            'enemies': self.enemy_pool.stats(),
+            'projectiles': self.tower.projectile_pool.stats(),
+        }
+        if self.enemy_store is not None:
+            stats['enemy_views'] = self.enemy_store.view_pool.stats()
+        if self.projectile_store is not None:
+            stats['projectile_views'] = self.projectile_store.view_pool.stats()
+        return stats
+
+    def set_pool_checks(self, enabled=True):
+        '''Check every recycled instance for state left from earlier use'''
+        pools_ = [self.enemy_pool, self.tower.projectile_pool]
+        if self.enemy_store is not None:
+            pools_.append(self.enemy_store.view_pool)
+        if self.projectile_store is not None:
+            pools_.append(self.projectile_store.view_pool)
+        for pool in pools_:
+            pool.check = enabled
+
+    def _process_interactions(self):
+        """Handle interactions between game entities"""
+        # Enemies touching the tower damage it; arrivals are scheduled, so
+        # only enemies that have reached it are looked at
+        if self.enemy_store is not None:
+            damage = self.enemy_store.contact_damage()
+        else:
+            damage = self.contacts.damage()
+        if damage:
+            self.tower.health -= damage
+            self.telemetry.emit('tower_damaged', telemetry.DEBUG, damage=damage,
+                                health=self.tower.health)
 
     def _handle_enemy_death(self, enemy):
         """Handle enemy death - award cash and score"""
         # Award cash for kill (before they're removed)
         if enemy.health <= 0:
-            print(f"Enemy killed! Awarded ${enemy.bounty}")
             self.cash += enemy.bounty
+            self.telemetry.emit('enemy_killed', bounty=enemy.bounty, cash=self.cash)
+        enemy.kill()
 
     def _check_game_state(self):
         """Check for game over conditions"""
         if self.tower.health <= 0:
             self.game_over = True
-            print("GAME OVER - Tower Destroyed!")
+            self.telemetry.emit('game_over', telemetry.WARNING, wave=self.wave_number,
+                                cash=self.cash)
 
     def toggle_pause(self):
         """Toggle pause state"""
+        self._record('toggle_pause')
         self.paused = not self.paused
 
     def reset_game(self):
         """Reset the game to initial state"""
-        self.__init__(self.screen)
+        self._record('reset_game')
+        recorder = self.recorder
+        # The new game's seed comes from this one's generator, so resets
+        # replay deterministically
+        seed = int(self.rng.integers(2**63))
+        self.__init__(self.screen, self.clock, self.enemy_engine,
+                      self.projectile_engine, self.spawner.budget,
+                      self.profiler, seed, self.telemetry, self.ledger)
+        self.recorder = recorder
+
+    def upgrade_costs(self):
+        """Current cash cost of each tower upgrade"""
+        return {
+            'damage': 50 + self.tower.damage * 2,
+            'speed': 50 + (self.tower.cooldown * 3),
+            'armor': 50 + (self.tower.max_health * 2),
+        }
 
     def upgrade_tower_damage(self):
         """Upgrade tower damage if player has enough cash"""
-        upgrade_cost = 50 + self.tower.damage * 2
+        self._record('upgrade_tower_damage')
+        upgrade_cost = self.upgrade_costs()['damage']
 
         if self.cash >= upgrade_cost:
             self.cash -= upgrade_cost
             self.tower.damage += 5
-            print(
-                f"Damage upgraded to {
-                    self.tower.damage}. Remaining cash: ${
-                    self.cash}")
+            self.telemetry.emit('upgrade_damage', damage=self.tower.damage,
+                                cost=upgrade_cost, cash=self.cash)
             return True
         else:
-            print(f"Not enough cash! Need ${upgrade_cost}, have ${self.cash}")
+            self.telemetry.emit('upgrade_unaffordable', upgrade='damage',
+                                cost=upgrade_cost, cash=self.cash)
             return False
 
     def upgrade_tower_speed(self):
         """Upgrade tower attack speed if player has enough cash"""
-        upgrade_cost = 50 + (self.tower.cooldown * 3)
+        self._record('upgrade_tower_speed')
+        upgrade_cost = self.upgrade_costs()['speed']
 
         if self.cash >= upgrade_cost and self.tower.cooldown > 5:
             self.cash -= upgrade_cost
             self.tower.cooldown -= 2
-            print(
-                f"Speed upgraded! Cooldown: {
-                    self.tower.cooldown}. Remaining cash: ${
-                    self.cash}")
+            self.telemetry.emit('upgrade_speed', cooldown=self.tower.cooldown,
+                                cost=upgrade_cost, cash=self.cash)
             return True
         else:
             if self.tower.cooldown <= 5:
-                print("Speed already at maximum!")
+                self.telemetry.emit('upgrade_maxed', upgrade='speed')
             else:
-                print(
-                    f"Not enough cash! Need ${upgrade_cost}, have ${
-                        self.cash}")
+                self.telemetry.emit('upgrade_unaffordable', upgrade='speed',
+                                    cost=upgrade_cost, cash=self.cash)
             return False
 
     def upgrade_tower_armor(self):
         """Upgrade tower armor (max health) if player has enough cash"""
-        upgrade_cost = 50 + (self.tower.max_health * 2)
+        self._record('upgrade_tower_armor')
+        upgrade_cost = self.upgrade_costs()['armor']
 
         if self.cash >= upgrade_cost:
             self.cash -= upgrade_cost
             self.tower.max_health += 20
             self.tower.health += 20
-            print(
-                f"Armor upgraded! Max health: {
-                    self.tower.max_health}. Remaining cash: ${
-                    self.cash}")
+            self.telemetry.emit('upgrade_armor', max_health=self.tower.max_health,
+                                cost=upgrade_cost, cash=self.cash)
             return True
         else:
-            print(f"Not enough cash! Need ${upgrade_cost}, have ${self.cash}")
+            self.telemetry.emit('upgrade_unaffordable', upgrade='armor',
+                                cost=upgrade_cost, cash=self.cash)
             return False
 
-    def draw(self):
-        """Draw all game entities"""
-        self.enemies.draw(self.screen)
-        self.projectiles.draw(self.screen)
-        self.tower.draw(self.screen)
+    def set_render_alpha(self, alpha):
+        '''Draw entities alpha of the way from their previous tick's positions'''
+        for store in (self.enemy_store, self.projectile_store):
+            if store is not None:
+                store.render_alpha = alpha
+
+    def draw(self, point_cloud=None):
+        """
+        Draw all game entities. With a render.PointCloud, enemies and
+        projectiles are drawn as points while there are too many for sprites
+        """
+        if self.screen is None:
+            return
+        if point_cloud is None or not point_cloud.draw(self, self.screen):
+            self.enemies.draw(self.screen)
+            self.projectiles.draw(self.screen)
+        for tower in self.towers:
+            tower.draw(self.screen)
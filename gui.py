@@ -1,13 +1,39 @@
 import pygame
+import assets
 import consts
 
+# Rendered text shared between widgets, so they don't re-render it
+_text_cache = {}
+TEXT_CACHE_SIZE = 256
+
+# Every font size the HUD and overlays use, for assets.preload()
+FONT_SIZES = (18, 24, 36, 72)
+
+
+def get_font(size):
+    '''Shared default font at the given size'''
+    return assets.font(size)
+
+
+def render_text(font, text, color):
+    '''Antialiased text surface, cached by (font, text, color)'''
+    key = (font, text, color)
+    surface = _text_cache.get(key)
+    if surface is None:
+        if len(_text_cache) >= TEXT_CACHE_SIZE:
+            # Drop the oldest entry
+            del _text_cache[next(iter(_text_cache))]
+        surface = font.render(text, True, color)
+        _text_cache[key] = surface
+    return surface
+
 
 class Interface(pygame.sprite.Sprite):
     '''Class defining the game interface'''
 
-    def __init__(self, game_manager):
+    def __init__(self, game_manager, timestep=None):
         super().__init__()
-        self.font = pygame.font.Font(None, 24)
+        self.font = get_font(24)
         self.game_manager = game_manager
         self.tower = game_manager.tower
 
@@ -25,27 +51,29 @@ class Interface(pygame.sprite.Sprite):
         self.arm_button = Button(230, consts.SCREEN_HEIGHT - 50, 100, 30, text='ARM+',
                                  callback=game_manager.upgrade_tower_armor)
 
+        self.widgets = [self.dmg_button, self.spd_button, self.arm_button,
+                        self.tower_stats_interface]
+        if timestep is not None:
+            self.widgets.append(SpeedIndicator(timestep))
+        self.changed_rects = []         # Widget rects repainted this frame
+
     def update(self):
-        '''Update interface elements'''
-        self.image.fill((0, 0, 0, 0))  # Clear with transparent
-
-        # Draw health bar, scores, upgrade costs
-        #self._draw_healthbar()
-        #self._draw_scores()
-        self.tower_stats_interface.update()
-        
-
-        # Draw buttons
-        self.dmg_button.draw()
-        self.spd_button.draw()
-        self.arm_button.draw()
-
-        # Blit buttons onto interface
-        self.image.blit(self.dmg_button.image, self.dmg_button.rect)
-        self.image.blit(self.spd_button.image, self.spd_button.rect)
-        self.image.blit(self.arm_button.image, self.arm_button.rect)
-        
-        self.image.blit(self.tower_stats_interface.image, self.tower_stats_interface.rect)
+        '''Repaint only the widgets whose bound values changed'''
+        self.changed_rects = []
+        for widget in self.widgets:
+            if widget.update():
+                self.image.fill((0, 0, 0, 0), widget.rect)
+                self.image.blit(widget.image, widget.rect)
+                self.changed_rects.append(widget.rect)
+
+    def draw(self, screen):
+        '''Blit each widget, skipping the transparent full-screen layer'''
+        for widget in self.widgets:
+            screen.blit(widget.image, widget.rect)
+
+    def widget_rects(self):
+        '''Screen rects covered by drawn widgets'''
+        return [widget.rect for widget in self.widgets]
 
     def _draw_healthbar(self):
         buff = 2
@@ -60,14 +88,14 @@ class Interface(pygame.sprite.Sprite):
         pygame.draw.rect(self.image, (0, 128, 0), healthbar_pos)
 
     def _draw_scores(self):
-        health_text = self.font.render(f'{round(self.tower.health)}/{self.tower.max_health}',
-                                       True, consts.WHITE)
-        cash_text = self.font.render(
-            f'${self.game_manager.cash}', True, consts.WHITE)
-        wave_text = self.font.render(
+        health_text = render_text(self.font, f'{round(self.tower.health)}/{self.tower.max_health}',
+                                  consts.WHITE)
+        cash_text = render_text(
+            self.font, f'${self.game_manager.cash}', consts.WHITE)
+        wave_text = render_text(
+            self.font,
             f'Wave: {
                 self.game_manager.wave_number}',
-            True,
             consts.WHITE)
 
         self.image.blit(health_text, (consts.SCREEN_WIDTH / 2 - 25, 52))
@@ -98,29 +126,62 @@ class TowerStatsInterface(pygame.sprite.Sprite):
 
     def __init__(self, tower):
         super().__init__()
-        self.font = pygame.font.Font(None, 24)
+        self.font = get_font(24)
         self.tower = tower
 
         self.image = pygame.Surface(
             (self.BOX_WIDTH, self.BOX_HEIGHT), pygame.SRCALPHA)
         self.rect = self.image.get_rect(topleft=(consts.SCREEN_WIDTH/2 - self.BOX_WIDTH/2, 5))
+        self._drawn = None              # Values shown by the current image
 
     def update(self):
-        '''Update tower stats interface elements'''
+        '''Redraw if the bound tower stats changed. Returns True if redrawn'''
+        values = (self.tower.health, self.tower.cash)
+        if values == self._drawn:
+            return False
+        self._drawn = values
+
         self.image.fill((0, 0, 0))
         pygame.draw.rect(self.image, consts.BLACK, self.image.get_rect(), 2)
 
         # Draw tower stats
         self._draw_tower_stats()
+        return True
 
     def _draw_tower_stats(self):
-        health_text = self.font.render(f'Health: {self.tower.health}', True, consts.WHITE)
-        score_text = self.font.render(f'Cash: {self.tower.cash}', True, consts.WHITE)
+        health_text = render_text(self.font, f'Health: {self.tower.health:.0f}', consts.WHITE)
+        score_text = render_text(self.font, f'Cash: {self.tower.cash}', consts.WHITE)
 
         self.image.blit(health_text, (100, 100))
         self.image.blit(score_text, (100, 140))
 
 
+class SpeedIndicator(pygame.sprite.Sprite):
+    '''Shows the simulation speed multiplier while fast-forwarding'''
+
+    def __init__(self, timestep):
+        super().__init__()
+        self.font = get_font(24)
+        self.timestep = timestep
+
+        self.image = pygame.Surface((60, 24), pygame.SRCALPHA)
+        self.rect = self.image.get_rect(topright=(consts.SCREEN_WIDTH - 10, 10))
+        self._drawn = None
+
+    def update(self):
+        '''Redraw if the speed changed. Returns True if redrawn'''
+        speed = self.timestep.speed
+        if speed == self._drawn:
+            return False
+        self._drawn = speed
+
+        self.image.fill((0, 0, 0, 0))
+        if speed != 1:
+            text = render_text(self.font, f'>> {speed}x', consts.WHITE)
+            self.image.blit(text, text.get_rect(topright=(self.rect.width, 0)))
+        return True
+
+
 class Button(pygame.sprite.Sprite):
     """Simple rectangular button as a Sprite, with optional border + rounded corners."""
 
@@ -145,13 +206,13 @@ class Button(pygame.sprite.Sprite):
         self.border_width = border_width
         self.border_radius = border_radius
 
-        self.font = pygame.font.Font(None, 24)
+        self.font = get_font(24)
 
         # Use SRCALPHA so rounded corners can be transparent
         self.image = pygame.Surface((width, height), pygame.SRCALPHA).convert_alpha()
         self.rect = self.image.get_rect(topleft=(x, y))
 
-        self.draw()
+        self._drawn = None              # Appearance of the current image
 
     def draw(self):
         """Render rounded rect button + border + text onto self.image."""
@@ -195,7 +256,7 @@ class Button(pygame.sprite.Sprite):
 
         # 3) Text
         if self.text:
-            text_surf = self.font.render(self.text, True, self.text_color)
+            text_surf = render_text(self.font, self.text, self.text_color)
             text_rect = text_surf.get_rect(center=outer_rect.center)
             self.image.blit(text_surf, text_rect)
 
@@ -208,5 +269,119 @@ class Button(pygame.sprite.Sprite):
         return False
 
     def update(self):
-        """Update button if needed (e.g., hover effects)"""
-        pass
\ No newline at end of file
+        """Redraw if the button's appearance changed. Returns True if redrawn"""
+        appearance = (self.text, self.text_color, self.button_color,
+                      self.border_color, self.border_width, self.border_radius)
+        if appearance == self._drawn:
+            return False
+        self._drawn = appearance
+        self.draw()
+        return True
+
+
+class Overlay:
+    '''Full-screen dimming layer with centered text, built once'''
+
+    def __init__(self, alpha):
+        self.shade = pygame.Surface((consts.SCREEN_WIDTH, consts.SCREEN_HEIGHT))
+        self.shade.set_alpha(alpha)
+        self.shade.fill((0, 0, 0))
+        self.lines = []                 # (text surface, screen rect)
+
+    def set_lines(self, lines):
+        '''Lay out (text, font size, color, y offset from center) lines'''
+        self.lines = []
+        for text, size, color, dy in lines:
+            surface = render_text(get_font(size), text, color)
+            rect = surface.get_rect(center=(consts.SCREEN_WIDTH / 2,
+                                            consts.SCREEN_HEIGHT / 2 + dy))
+            self.lines.append((surface, rect))
+
+    def draw(self, screen):
+        screen.blit(self.shade, (0, 0))
+        for surface, rect in self.lines:
+            screen.blit(surface, rect)
+
+
+class PauseOverlay(Overlay):
+    '''Pause screen overlay'''
+
+    def __init__(self):
+        super().__init__(128)
+        self.set_lines([("PAUSED", 72, (255, 255, 255), 0)])
+
+
+class GameOverOverlay(Overlay):
+    '''Game over overlay, re-laid out only when the wave reached changes'''
+
+    def __init__(self):
+        super().__init__(192)
+        self.wave_number = None
+
+    def draw(self, screen, wave_number):
+        if wave_number != self.wave_number:
+            self.wave_number = wave_number
+            self.set_lines([
+                ("GAME OVER", 72, (255, 0, 0), -60),
+                (f"Reached Wave: {wave_number}", 36, (255, 255, 255), 20),
+                ("Press R to Restart", 36, (255, 255, 255), 120),
+            ])
+        super().draw(screen)
+
+
+class ProfilerOverlay:
+    '''Frame-time graph and per-phase bars drawn from a FrameProfiler'''
+
+    WIDTH = 300
+    GRAPH_HEIGHT = 80
+    BAR_HEIGHT = 14
+    PHASE_COLORS = [(255, 99, 71), (255, 215, 0), (50, 205, 50), (30, 144, 255),
+                    (238, 130, 238), (0, 206, 209), (255, 165, 0), (192, 192, 192)]
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.font = get_font(18)
+        self.topleft = (consts.SCREEN_WIDTH - self.WIDTH - 10, 10)
+
+    def draw(self, screen):
+        '''Draw the graph and bars for the frames recorded so far'''
+        frame_times = self.profiler.frame_times
+        if not frame_times:
+            return
+
+        x0, y0 = self.topleft
+        budget = consts.FRAME_BUDGET_MS
+        phases = sorted(self.profiler.phases.items())
+        height = self.GRAPH_HEIGHT + 30 + len(phases) * (self.BAR_HEIGHT + 2)
+
+        panel = pygame.Rect(x0, y0, self.WIDTH, height)
+        pygame.draw.rect(screen, (20, 20, 20), panel)
+        pygame.draw.rect(screen, consts.WHITE, panel, 1)
+
+        # Frame-time graph, scaled so the frame budget sits at mid-height
+        graph_bottom = y0 + self.GRAPH_HEIGHT
+        scale = self.GRAPH_HEIGHT / (2 * budget)
+        step = self.WIDTH / max(self.profiler.history - 1, 1)
+        budget_y = graph_bottom - budget * scale
+        pygame.draw.line(screen, consts.RED, (x0, budget_y), (x0 + self.WIDTH, budget_y))
+        if len(frame_times) > 1:
+            points = [(x0 + i * step, graph_bottom - min(ms * scale, self.GRAPH_HEIGHT))
+                      for i, ms in enumerate(frame_times)]
+            pygame.draw.lines(screen, consts.GREEN, False, points)
+
+        # These labels change every frame, so render them directly rather
+        # than let them push the HUD's stable text out of the shared cache
+        latest = self.font.render(f'frame {frame_times[-1]:.1f} ms / '
+                                  f'{budget:.1f} ms budget', True, consts.WHITE)
+        screen.blit(latest, (x0 + 4, graph_bottom + 6))
+
+        # Per-phase bars of mean time, as a fraction of the frame budget
+        y = graph_bottom + 26
+        for i, (name, times) in enumerate(phases):
+            mean_ms = sum(times) / len(times) if times else 0.0
+            width = min(self.WIDTH - 8, (self.WIDTH - 8) * mean_ms / budget)
+            color = self.PHASE_COLORS[i % len(self.PHASE_COLORS)]
+            pygame.draw.rect(screen, color, (x0 + 4, y, max(1, width), self.BAR_HEIGHT))
+            label = self.font.render(f'{name} {mean_ms:.2f} ms', True, consts.WHITE)
+            screen.blit(label, (x0 + 8, y))
+            y += self.BAR_HEIGHT + 2
@@ -1,30 +1,107 @@
+import argparse
+import os
+import time
 import pygame as pg
+import assets
 import consts
 import gui
 import game_manager
+import offline
+import profiler
+import render
+import snapshot
+import telemetry
+from sim_clock import FixedTimestep, SimClock
 
-# Initialize pygame module
-pg.font.init()
+# Number keys pick the simulation speed
+SPEED_KEYS = dict(zip((pg.constants.K_1, pg.constants.K_2, pg.constants.K_3, pg.constants.K_4),
+                      consts.SPEED_MULTIPLIERS))
 
-# Create pygame screen
-screen = pg.display.set_mode((consts.SCREEN_WIDTH, consts.SCREEN_HEIGHT))
-pg.display.set_caption('Tower Defense')
-
-def game_loop():
+def game_loop(dirty_rects=False, profile=False, profile_out=None, seed=None,
+              record=None, load=None, telemetry_out=None, log_level=telemetry.INFO,
+              speed=1, new_game=False, lod_threshold=consts.LOD_ENTITY_THRESHOLD,
+              preload=True, mute=False):
     '''main game loop'''
+    started = time.perf_counter()
+
+    # Create pygame screen
+    screen = pg.display.set_mode((consts.SCREEN_WIDTH, consts.SCREEN_HEIGHT))
+    pg.display.set_caption('Tower Defense')
     clock = pg.time.Clock()
 
+    # Fonts, sounds and artwork load in the background while the game is
+    # set up; anything asked for first is loaded on the spot instead. The
+    # font and mixer modules are started here, on the main thread
+    assets.init()
+    assets.muted = mute
+    if preload:
+        assets.preload(fonts=gui.FONT_SIZES, sounds=('shot',),
+                       sprites=('enemy', 'projectile'), background=True)
+    first_frame_ms = None
+
+    # Game events go to the console, and optionally a JSONL file, from a
+    # background thread
+    bus = telemetry.EventBus(level=telemetry.DEBUG if telemetry_out else log_level)
+    bus.add_sink(telemetry.StdoutSink(level=log_level))
+    if telemetry_out:
+        bus.add_sink(telemetry.JSONLSink(telemetry_out))
+    bus.start()
+
+    # Per-phase frame profiler, toggled with F3
+    frame_profiler = profiler.FrameProfiler(enabled=profile)
+    profiler_overlay = gui.ProfilerOverlay(frame_profiler)
+
+    # Enemies and projectiles are drawn as points while there are too many
+    # for sprites
+    point_cloud = render.PointCloud(lod_threshold)
+
+    # Optional renderer that only pushes changed screen regions
+    renderer = render.DirtyRenderer(screen, point_cloud=point_cloud) if dirty_rects else None
+
+    # Pause/game over overlays, built once
+    pause_overlay = gui.PauseOverlay()
+    game_over_overlay = gui.GameOverOverlay()
+
+    # The game is timed in fixed ticks, run as many per frame as the speed
+    # multiplier asks for, so fast-forward plays exactly like normal speed
+    timestep = FixedTimestep(speed=speed)
+
     # Create GameManager - centralized game state
-    game = game_manager.GameManager(screen)
+    game = game_manager.GameManager(screen, clock=SimClock(), profiler=frame_profiler,
+                                    seed=seed, telemetry_bus=bus)
+    if record:
+        game.start_recording(record)
 
     # Create interface - pass the game manager instead of just tower
-    interface = gui.Interface(game)
+    interface = gui.Interface(game, timestep)
     ui = pg.sprite.Group(interface)
 
-    # Spawn first wave
-    game.start_game()
+    # Only the player's own game is autosaved: seeded, recorded and
+    # explicitly loaded sessions leave the autosave alone
+    autosave = not (record or seed is not None or
+                    (load is not None and load != consts.AUTOSAVE_PATH))
+
+    # Pick up where the last session left off, unless a fresh game is wanted
+    if (autosave and load is None and not new_game and
+            os.path.exists(consts.AUTOSAVE_PATH)):
+        load = consts.AUTOSAVE_PATH
+
+    # Spawn first wave, or resume a saved game with credit for the time away
+    if load:
+        snapshot.load(game, load)
+        saved_at = snapshot.saved_time(load)
+        if saved_at is not None and not game.game_over:
+            offline.apply(game, offline.estimate(game, time.time() - saved_at))
+        game.running = True
+        interface = gui.Interface(game, timestep)
+        ui = pg.sprite.Group(interface)
+    else:
+        game.start_game()
 
+    frame_ms = timestep.tick_ms
     while game.running:
+        frame_profiler.begin_frame()
+
         # Event handling
         for event in pg.event.get():
             if event.type == pg.constants.QUIT:
@@ -32,80 +109,153 @@ def game_loop():
             elif event.type == pg.constants.KEYDOWN:
                 if event.key == pg.constants.K_SPACE:
                     game.toggle_pause()
+                elif event.key in SPEED_KEYS:
+                    timestep.speed = SPEED_KEYS[event.key]
+                elif event.key == pg.constants.K_F3:
+                    frame_profiler.toggle()
+                elif event.key == pg.constants.K_F5:
+                    snapshot.save(game, consts.QUICKSAVE_PATH)
+                    print(f"Game saved to {consts.QUICKSAVE_PATH}")
+                elif event.key == pg.constants.K_F9 and os.path.exists(consts.QUICKSAVE_PATH):
+                    if game.recorder is not None:
+                        # A loaded game can't be replayed from this recording
+                        game.recorder.close()
+                    snapshot.load(game, consts.QUICKSAVE_PATH)
+                    game.running = True
+                    interface = gui.Interface(game, timestep)
+                    ui = pg.sprite.Group(interface)
+                    if renderer is not None:
+                        renderer.invalidate()
                 elif event.key == pg.constants.K_r and game.game_over:
                     game.reset_game()
-                    interface = gui.Interface(game)
+                    interface = gui.Interface(game, timestep)
                     ui = pg.sprite.Group(interface)
+                    if renderer is not None:
+                        renderer.invalidate()
 
             # Handle button clicks
             interface.dmg_button.handle_event(event)
             interface.spd_button.handle_event(event)
             interface.arm_button.handle_event(event)
+        frame_profiler.lap('events')
 
-        # Update game state
-        game.update()
+        # Update game state: run the ticks owed for the last frame's time,
+        # then draw entities between the last two ticks by the time left over
+        timestep.advance(frame_ms, game.update)
+        game.set_render_alpha(1.0 if game.paused or game.game_over else timestep.alpha)
         ui.update()
+        frame_profiler.lap('ui')
 
         # Rendering
+        if renderer is not None:
+            overlays = []
+            if game.paused:
+                overlays.append(pause_overlay.draw)
+            elif game.game_over:
+                overlays.append(
+                    lambda screen: game_over_overlay.draw(screen, game.wave_number))
+            if frame_profiler.enabled:
+                overlays.append(profiler_overlay.draw)
+
+            overlay = None
+            if overlays:
+                def overlay(screen):
+                    for draw in overlays:
+                        draw(screen)
+            renderer.render(game, interface, overlay)
+            if first_frame_ms is None:
+                first_frame_ms = (time.perf_counter() - started) * 1000
+            frame_profiler.lap('render')
+            frame_profiler.end_frame()
+            frame_ms = clock.tick(consts.FPS)
+            continue
+
         screen.fill(consts.BACKGROUND_COLOR)
-        game.draw()
-        ui.draw(screen)
+        game.draw(point_cloud)
+        interface.draw(screen)
 
         # Draw pause/game over overlays
         if game.paused:
-            _draw_pause_overlay(screen)
+            pause_overlay.draw(screen)
         elif game.game_over:
-            _draw_game_over_overlay(screen, game.wave_number)
+            game_over_overlay.draw(screen, game.wave_number)
+        if frame_profiler.enabled:
+            profiler_overlay.draw(screen)
+        frame_profiler.lap('draw')
 
         pg.display.flip()
-        clock.tick(consts.FPS)
-
-
-def _draw_pause_overlay(screen):
-    """Draw pause overlay"""
-    font = pg.font.Font(None, 72)
-    text = font.render("PAUSED", True, (255, 255, 255))
-    text_rect = text.get_rect(
-        center=(
-            consts.SCREEN_WIDTH / 2,
-            consts.SCREEN_HEIGHT / 2))
-
-    # Semi-transparent overlay
-    overlay = pg.Surface((consts.SCREEN_WIDTH, consts.SCREEN_HEIGHT))
-    overlay.set_alpha(128)
-    overlay.fill((0, 0, 0))
-    screen.blit(overlay, (0, 0))
-    screen.blit(text, text_rect)
-
-
-def _draw_game_over_overlay(screen, wave_number):
-    """Draw game over overlay"""
-    font_large = pg.font.Font(None, 72)
-    font_small = pg.font.Font(None, 36)
-
-    game_over_text = font_large.render("GAME OVER", True, (255, 0, 0))
-    wave_text = font_small.render(
-        f"Reached Wave: {wave_number}", True, (255, 255, 255))
-    restart_text = font_small.render(
-        "Press R to Restart", True, (255, 255, 255))
-
-    # Semi-transparent overlay
-    overlay = pg.Surface((consts.SCREEN_WIDTH, consts.SCREEN_HEIGHT))
-    overlay.set_alpha(192)
-    overlay.fill((0, 0, 0))
-    screen.blit(overlay, (0, 0))
-
-    # Position text
-    screen.blit(game_over_text,
-                game_over_text.get_rect(center=(consts.SCREEN_WIDTH / 2,
-                                                consts.SCREEN_HEIGHT / 2 - 60)))
-    screen.blit(wave_text,
-                wave_text.get_rect(center=(consts.SCREEN_WIDTH / 2,
-                                           consts.SCREEN_HEIGHT / 2 + 20)))
-    screen.blit(restart_text,
-                restart_text.get_rect(center=(consts.SCREEN_WIDTH / 2,
-                                              consts.SCREEN_HEIGHT / 2 + 120)))
+        if first_frame_ms is None:
+            first_frame_ms = (time.perf_counter() - started) * 1000
+        frame_profiler.lap('flip')
+        frame_profiler.end_frame()
+        frame_ms = clock.tick(consts.FPS)
+
+    # Save for next launch; a lost game starts over
+    if autosave and game.game_over:
+        if os.path.exists(consts.AUTOSAVE_PATH):
+            os.remove(consts.AUTOSAVE_PATH)
+    elif autosave:
+        snapshot.save(game, consts.AUTOSAVE_PATH)
+
+    if first_frame_ms is not None:
+        bus.emit('first_frame', ms=round(first_frame_ms, 1), preload=preload)
+    bus.close()
+
+    if first_frame_ms is not None:
+        print(f"First frame after {first_frame_ms:.0f} ms" +
+              (f" (assets preloaded in {assets.preload_ms:.0f} ms)"
+               if assets.preload_ms is not None else ""))
+
+    if timestep.dropped:
+        print(f"Dropped {timestep.dropped} simulation ticks to keep up")
+
+    if game.recorder is not None:
+        game.recorder.close()
+        print(f"Recorded {game.recorder.ticks} ticks to {record}")
+
+    if renderer is not None:
+        print(f"Mean dirty-pixel fraction: {renderer.mean_dirty_fraction():.3f} "
+              f"({renderer.partial_updates} partial, "
+              f"{renderer.full_updates} full updates)")
+
+    if profile_out and frame_profiler.records:
+        frame_profiler.dump(profile_out)
+        print(f"Frame profile written to {profile_out}")
 
 
 if __name__ == "__main__":
-    game_loop()
+    parser = argparse.ArgumentParser(description='Idle Tower Defense')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='only push changed screen regions each frame')
+    parser.add_argument('--profile', action='store_true',
+                        help='start with the frame profiler on (F3 toggles)')
+    parser.add_argument('--profile-out', metavar='PATH',
+                        help='dump profiled frames to PATH (.json or .csv) on exit')
+    parser.add_argument('--seed', type=int,
+                        help='seed the game for a reproducible run')
+    parser.add_argument('--record', metavar='PATH',
+                        help='record inputs to PATH for replay.py')
+    parser.add_argument('--load', metavar='PATH',
+                        help='resume a game saved with F5 (F9 reloads the quicksave)')
+    parser.add_argument('--telemetry', metavar='PATH',
+                        help='also log game events to PATH as JSON lines')
+    parser.add_argument('--log-level', choices=['debug', 'info', 'warning'],
+                        default='info', help='least severe event printed')
+    parser.add_argument('--speed', type=int, choices=consts.SPEED_MULTIPLIERS, default=1,
+                        help='start fast-forwarded (keys 1-4 change speed)')
+    parser.add_argument('--new', action='store_true',
+                        help=f'start a new game instead of resuming {consts.AUTOSAVE_PATH}')
+    parser.add_argument('--no-preload', action='store_true',
+                        help='load assets only when first used')
+    parser.add_argument('--mute', action='store_true', help='turn off sounds')
+    parser.add_argument('--lod', type=int, default=consts.LOD_ENTITY_THRESHOLD, metavar='N',
+                        help='draw entities as points above N of them (0: always sprites)')
+    args = parser.parse_args()
+    if args.load and args.record:
+        parser.error('a loaded game cannot be recorded for replay')
+    game_loop(dirty_rects=args.dirty_rects, profile=args.profile,
+              profile_out=args.profile_out, seed=args.seed, record=args.record,
+              load=args.load, telemetry_out=args.telemetry,
+              log_level=getattr(telemetry, args.log_level.upper()), speed=args.speed,
+              new_game=args.new, lod_threshold=args.lod,
+              preload=not args.no_preload, mute=args.mute)
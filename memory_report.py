@@ -0,0 +1,86 @@
+'''Reports memory cost per entity at a given wave'''
+import argparse
+import tracemalloc
+import pygame as pg
+import units
+from enemy_store import EnemyStore
+
+
+def wave_size(wave):
+    '''Enemies spawned in a wave, as in GameManager._spawn_next_wave'''
+    return 20 + wave * 5
+
+
+def _attributes(entity):
+    '''Instance attribute values, from both __dict__ and __slots__'''
+    values = list(getattr(entity, '__dict__', {}).values())
+    for cls in type(entity).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if hasattr(entity, name):
+                values.append(getattr(entity, name))
+    return values
+
+
+def bytes_per_entity(factory, count):
+    '''
+    Average memory cost of creating count entities: Python allocations
+    traced by tracemalloc, plus the SDL pixel buffers of every distinct
+    Surface the entities reference (shared artwork is counted once).
+    '''
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    entities = [factory(i) for i in range(count)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    surfaces = {}
+    for entity in entities:
+        for value in _attributes(entity):
+            if isinstance(value, pg.Surface):
+                surfaces[id(value)] = value
+    pixel_bytes = sum(surface.get_width() * surface.get_height() *
+                      surface.get_bytesize() for surface in surfaces.values())
+
+    return (after - before + pixel_bytes) / count
+
+
+def report(wave=100):
+    '''Bytes per enemy and per projectile for a wave's worth of entities'''
+    count = wave_size(wave)
+    group = pg.sprite.Group()
+
+    def make_enemy(i):
+        enemy = units.Enemy(i, i)
+        group.add(enemy)
+        return enemy
+
+    enemy_bytes = bytes_per_entity(make_enemy, count)
+
+    store = EnemyStore(capacity=1)
+    store_group = pg.sprite.Group()
+
+    def make_view(i):
+        view = store.spawn(i, i)
+        store_group.add(view)
+        return view
+
+    store_bytes = bytes_per_entity(make_view, count)
+    target = units.Enemy(0, 0)
+    projectile_bytes = bytes_per_entity(
+        lambda i: units.Projectile((i, i), target), count)
+
+    return {
+        'wave': wave,
+        'enemies': count,
+        'bytes_per_enemy': round(enemy_bytes),
+        'bytes_per_store_enemy': round(store_bytes),
+        'bytes_per_projectile': round(projectile_bytes),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--wave', type=int, default=100)
+    args = parser.parse_args()
+    for key, value in report(args.wave).items():
+        print(f'{key}: {value}')
@@ -0,0 +1,464 @@
+'''
+Offline ("while you were away") progress
+
+When a saved game is resumed, estimate() works out what the tower would
+have done in the time the game was closed: the waves it would have
+cleared and the cash it would have earned. Instead of simulating hours of
+ticks it plays each wave through a per-enemy queue model:
+
+- enemies walk straight at the tower, so each one's range entry and
+  arrival ticks follow from its spawn distance, and the tower (which
+  always picks the nearest enemy) kills them in order of distance;
+- the tower fires its next shot at the later of its cooldown, the next
+  enemy entering range and the current target dying, and keeps firing at
+  a target until its killing shot lands; with the pending-damage ledger
+  it moves on as soon as the killing shot is fired instead;
+- enemies that reach the tower deal contact damage every tick until they
+  are killed.
+
+Each wave is worked out in one NumPy pass, but a long absence with a strong
+tower still means millions of enemies. Waves grow steadily, so once the
+tower has fallen behind them (every recent wave reaches it) their length
+and cash grow linearly with the wave number and the contact damage they
+deal quadratically. Once OFFLINE_EXACT_ENEMIES have been modelled and at
+least OFFLINE_FIT_WAVES waves in a row have reached the tower, the
+remaining waves are extrapolated from fits of those waves, so an estimate
+costs a bounded amount of work.
+
+Running this module checks the model against the full simulation from
+seeded saves, then times long absences for strong towers against the
+model without extrapolation:
+
+    python offline.py --games 20 --minutes 10 --hours 24
+'''
+import argparse
+import math
+import time
+import numpy as np
+import consts
+import game_manager
+import snapshot
+from enemy_store import ALIVE, DYING
+
+PROJECTILE_SPEED = 5            # Tower shot speed (see Tower.update)
+HIT_RADIUS = 5                  # Shots land within this many pixels
+
+# Stats of enemies spawned by GameManager (EnemyStore.spawn_many defaults)
+ENEMY_HEALTH = 1
+ENEMY_DAMAGE = 1
+ENEMY_SPEED = 1
+ENEMY_BOUNTY = 1
+ENEMY_DEATH_DURATION = 30
+
+
+class _TowerModel:
+    '''The tower state carried from wave to wave'''
+
+    def __init__(self, tower):
+        self.health = float(tower.health)
+        self.damage = tower.damage
+        self.range = tower.range
+        self.cooldown = tower.cooldown
+        self.ready = tower.cooldown_count       # Tick the next shot can fire
+        self.ledger = tower.ledger
+
+
+def _flight(distance, speed, moving_ticks):
+    '''
+    Ticks until shots fired at enemies distance away, closing at speed,
+    land. moving_ticks is how long each enemy keeps moving before it stops
+    at the tower.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ticks = np.where(speed > 0,
+                         np.ceil(distance / (PROJECTILE_SPEED + speed)),
+                         np.ceil(distance / PROJECTILE_SPEED))
+        ticks = np.maximum(ticks, 1)
+        stopped = np.minimum(distance, consts.TOWER_SIZE)
+        late = np.maximum(np.maximum(moving_ticks, 1),
+                          np.ceil(stopped / PROJECTILE_SPEED))
+    return np.where((speed > 0) & (ticks > moving_ticks), late, ticks)
+
+
+def _schedule(earliest, step):
+    '''
+    First shot tick of each target, when target i can't be shot before
+    earliest[i] and holds the tower for step[i] ticks: the max-plus scan
+    first[i] = max(earliest[i], first[i - 1] + step[i - 1])
+    '''
+    offset = np.concatenate([[0.0], np.cumsum(step)])[:len(step)]
+    return offset + np.maximum.accumulate(earliest - offset)
+
+
+def _play_wave(tower, start, distances, healths, speeds, damages, bounties):
+    '''
+    Model one wave whose enemies are at distances from the tower at tick
+    start. Returns the tick the last enemy is removed, the tick the tower
+    is destroyed (or None) and the removal ticks and bounties of the kills.
+
+    Every target is worked out at once with NumPy. Without the ledger how
+    long the tower holds a target depends on when its shots land, so the
+    schedule is iterated to its fixed point; each pass fixes at least one
+    more target, and in practice a handful of passes settle a wave.
+    '''
+    order = np.argsort(distances, kind='stable')
+    distance = distances[order].astype(float)
+    speed = speeds[order].astype(float)
+    health = healths[order].astype(float)
+
+    # Enemies that stand still out of range never come, so the wave never
+    # ends; the ones before them are still played
+    never = np.flatnonzero((speed <= 0) & (distance > tower.range))
+    finite = not len(never)
+    if not finite:
+        cut = never[0]
+        order, distance, speed, health = order[:cut], distance[:cut], speed[:cut], health[:cut]
+
+    moving = speed > 0
+    arrive_at = consts.TOWER_SIZE
+    with np.errstate(divide='ignore', invalid='ignore'):
+        enter = np.where(moving, start + np.maximum(0, np.ceil((distance - tower.range) / speed)),
+                         start)
+        arrive = np.where(moving, start + np.maximum(0, np.ceil((distance - arrive_at) / speed)),
+                          np.where(distance <= arrive_at, start, np.inf))
+
+    cooldown = tower.cooldown
+    shots = np.maximum(1, np.ceil(health / tower.damage))
+    earliest = enter.copy()
+    if len(earliest):
+        earliest[0] = max(earliest[0], tower.ready, start)
+
+    step = shots * cooldown
+    while True:
+        first = _schedule(earliest, step)
+        last = first + (shots - 1) * cooldown
+        gap = np.where(last >= arrive, arrive_at, distance - speed * (last - start))
+        kill = last + _flight(gap, speed, arrive - last)
+        if tower.ledger:
+            break
+        # The tower keeps firing at its target until the killing shot lands
+        fired = shots - 1 + np.maximum(1, np.ceil((kill - last) / cooldown))
+        if np.array_equal(fired * cooldown, step):
+            break
+        step = fired * cooldown
+    if len(first):
+        tower.ready = int(first[-1] + step[-1])
+
+    removed = (kill + 1 + ENEMY_DEATH_DURATION).astype(np.int64)
+    kills = (removed, bounties[order])
+    if not finite:
+        return math.inf, None, kills
+    hit = kill >= arrive
+    destroyed = _destroyed_at(tower, arrive[hit].astype(np.int64),
+                              kill[hit].astype(np.int64), damages[order][hit])
+    end = int(removed.max()) if len(removed) else start
+    return end, destroyed, kills
+
+
+def _destroyed_at(tower, arrive, kill, damage):
+    '''
+    Tick contact damage destroys the tower, or None; applies the damage.
+    Each enemy hits the tower with damage every tick from arrive to kill.
+    '''
+    if not len(arrive):
+        return None
+    total = float(np.sum((kill - arrive + 1) * damage))
+    if total < tower.health:
+        tower.health -= total
+        return None
+
+    # Damage per tick over the wave, to find when health runs out
+    first = int(arrive.min())
+    rate = np.zeros(int(kill.max()) - first + 2)
+    np.add.at(rate, arrive - first, damage)
+    np.add.at(rate, kill - first + 1, -damage)
+    dead = np.flatnonzero(np.cumsum(np.cumsum(rate)) >= tower.health)
+    tower.health = 0.0
+    return first + int(dead[0])
+
+
+def _current_wave(game):
+    '''The enemies in play as (distances, healths, speeds, damages, bounties), plus dying kills'''
+    store = game.enemy_store
+    n = store.top
+    alive = np.flatnonzero(store.state[:n] == ALIVE)
+    dx = consts.TOWER_X - store.x[alive]
+    dy = consts.TOWER_Y - store.y[alive]
+    wave = (np.sqrt(dx * dx + dy * dy), store.health[alive], store.speed[alive],
+            store.damage[alive], store.bounty[alive])
+
+    dying = np.flatnonzero(store.state[:n] == DYING)
+    removals = ((store.death_duration[dying] - store.death_timer[dying] + 1).astype(np.int64),
+                store.bounty[dying])
+    return wave, removals
+
+
+def _new_wave(game, count, rng):
+    '''
+    A freshly spawned wave of count enemies, drawn in the spawner's batches
+    so a copy of the game's generator gives the positions the game would
+    '''
+    xs, ys = game.spawner.region.sample_batches(count, game.spawner.budget, rng)
+    cx, cy = game.tower.pos
+    return (np.hypot(xs - cx, ys - cy), np.full(count, ENEMY_HEALTH),
+            np.full(count, ENEMY_SPEED), np.full(count, ENEMY_DAMAGE),
+            np.full(count, ENEMY_BOUNTY))
+
+
+_NO_REMOVALS = (np.zeros(0, dtype=np.int64), np.zeros(0))
+
+
+def _concat(a, b):
+    return tuple(np.concatenate([x, y]) for x, y in zip(a, b))
+
+
+def estimate(game, seconds, exact_enemies=consts.OFFLINE_EXACT_ENEMIES):
+    '''
+    Progress the game would make in seconds of absence. Returns a dict of
+    waves_cleared, the wave_number and tower_health after the last cleared
+    wave, cash_earned by then, cash_total including kills in an unfinished
+    wave, whether the tower would have been destroyed, and the wave
+    extrapolation started from (or None). Only the main tower is modelled;
+    kills by extra towers are not counted. exact_enemies=None models every
+    wave in full.
+    '''
+    if game.enemy_store is None:
+        raise ValueError('offline progress needs the array enemy engine')
+    seconds = min(seconds, consts.OFFLINE_MAX_SECONDS)
+    horizon = int(seconds * consts.FPS)
+    pause = math.ceil(game.wave_pause_ms * consts.FPS / 1000)
+    # Waves spawn where the game's own generator would put them
+    rng = np.random.default_rng()
+    rng.bit_generator.state = game.rng.bit_generator.state
+    tower = _TowerModel(game.tower)
+
+    # Finish the wave in play, if there is one
+    wave, removals = _current_wave(game)
+    if game.spawner.pending:
+        wave = _concat(wave, _new_wave(game, game.spawner.pending, rng))
+    wave_number = game.wave_number
+    if len(wave[0]) or len(removals[0]):
+        start = 0
+    else:
+        waited = game.clock.get_ticks() - game.last_wave_time
+        waited = waited * consts.FPS // 1000 if game.waiting_for_next_wave else 0
+        start = max(1, pause - waited)
+        wave_number += 1
+        wave = _new_wave(game, game.wave_size(wave_number), rng)
+
+    result = {
+        'seconds': seconds,
+        'waves_cleared': 0,
+        'wave_number': game.wave_number,
+        'tower_health': float(tower.health),
+        'cash_earned': 0,
+        'cash_total': 0,
+        'tower_destroyed': False,
+        'extrapolated_from': None,
+    }
+    modelled = 0
+    history = []                # (wave, ticks to next wave, health lost, cash) per cleared wave
+    damaging = 0                # Waves in a row that reached the tower
+    while True:
+        health = tower.health
+        end, destroyed, kills = _play_wave(tower, start, *wave)
+        modelled += len(wave[0])
+        removed, bounties = _concat(kills, removals)
+        removals = _NO_REMOVALS
+        stop = horizon if destroyed is None else min(horizon, destroyed)
+        earned = bounties[removed <= stop].sum()
+        result['cash_total'] += int(earned)
+        if destroyed is not None and destroyed <= horizon:
+            result['tower_destroyed'] = True
+            break
+        if end > horizon:
+            break
+
+        result['waves_cleared'] += 1
+        result['wave_number'] = wave_number
+        result['tower_health'] = float(tower.health)
+        result['cash_earned'] = result['cash_total']
+        history.append((wave_number, end + pause - start, health - tower.health, earned))
+        damaging = damaging + 1 if tower.health < health else 0
+
+        start = end + pause
+        wave_number += 1
+        if (exact_enemies is not None and modelled >= exact_enemies and
+                damaging >= consts.OFFLINE_FIT_WAVES):
+            result['extrapolated_from'] = wave_number
+            _extrapolate(result, history[-damaging:], tower, start, wave_number,
+                         horizon, pause)
+            break
+        wave = _new_wave(game, game.wave_size(wave_number), rng)
+    return result
+
+
+def _extrapolate(result, history, tower, start, wave_number, horizon, pause):
+    '''
+    Continue result from wave_number, starting at tick start, with each
+    wave's length and cash from straight-line fits of history against the
+    wave number, and its contact damage from a quadratic fit
+    '''
+    waves, ticks, lost, cash = np.array(history, dtype=float).T
+    fits = [np.polyfit(waves, ticks, 1), np.polyfit(waves, lost, 2),
+            np.polyfit(waves, cash, 1)]
+    health = tower.health
+    while True:
+        period, damage, earned = (float(np.polyval(fit, wave_number)) for fit in fits)
+        length = max(period - pause, 1.0)       # Spawn to last removal
+        damage = max(damage, 0.0)
+        earned = max(earned, 0.0)
+
+        # The share of the wave played before the absence ends, and before
+        # the tower falls, spreading the wave's damage and cash evenly
+        played = min(1.0, (horizon - start) / length)
+        if damage >= health and health / damage <= played:
+            result['cash_total'] += int(earned * health / damage)
+            result['tower_destroyed'] = True
+            return
+        result['cash_total'] += int(earned * played)
+        if played < 1.0:
+            return
+
+        health -= damage
+        result['waves_cleared'] += 1
+        result['wave_number'] = wave_number
+        result['tower_health'] = health
+        result['cash_earned'] = result['cash_total']
+        start += length + pause
+        wave_number += 1
+
+
+def apply(game, progress):
+    '''
+    Give the game the cleared waves and cash from estimate(). The field is
+    cleared and the next wave follows the usual pause; progress stops at the
+    last wave the tower would have survived.
+    '''
+    if progress['waves_cleared']:
+        for sprite in list(game.enemies) + list(game.projectiles):
+            sprite.kill()
+        game.spawner.pending = 0
+        game.tower.current_target = None
+        game.tower.health = progress['tower_health']
+        game.wave_number = progress['wave_number']
+        game.cash += progress['cash_earned']
+        game.tower.cash = game.cash
+        game.waiting_for_next_wave = True
+        game.last_wave_time = game.clock.get_ticks()
+    game.telemetry.emit('offline_progress', seconds=round(progress['seconds']),
+                        waves=progress['waves_cleared'], cash=progress['cash_earned'])
+    return progress
+
+
+# Strong towers for check_long(), as (damage, cooldown, health): the fastest
+# firing an upgraded tower reaches, and one beyond any upgrade
+LONG_ABSENCE_TOWERS = ((1, 5, 10**9), (50, 2, 10**9))
+
+
+def _saved_game(seed, wave, cooldown, armor, damage=1):
+    '''A seeded headless game with an upgraded tower, saved as wave spawns'''
+    game = game_manager.GameManager(seed=seed)
+    game.tower.damage = damage
+    game.tower.cooldown = game.tower.cooldown_count = cooldown
+    game.tower.max_health = game.tower.health = armor
+    game.start_game()
+    game.run_until_wave(wave)
+    return snapshot.snapshot(game)
+
+
+def _simulate(data, seconds):
+    '''Progress made by the full simulation in seconds, from a snapshot'''
+    game = snapshot.restore(game_manager.GameManager(), data)
+    start_wave = game.wave_number
+    start_cash = game.cash
+    game.run_ticks(int(seconds * consts.FPS))
+    cleared = game.wave_number - start_wave + 1
+    if game.game_over or len(game.enemies) or game.spawner.pending:
+        cleared -= 1
+    return {'waves_cleared': max(cleared, 0), 'cash_total': game.cash - start_cash,
+            'tower_destroyed': game.game_over}
+
+
+def check(games, minutes, base_seed=0):
+    '''Compare estimate() with the full simulation over seeded saves'''
+    rng = np.random.default_rng(base_seed)
+    seconds = minutes * 60
+    rows = []
+    for i in range(games):
+        cooldown = int(rng.integers(5, 31))
+        armor = int(rng.choice([100, 1000, 10000]))
+        wave = int(rng.integers(1, 4))
+        data = _saved_game(base_seed + i, wave, cooldown, armor)
+
+        start = time.perf_counter()
+        model = estimate(snapshot.restore(game_manager.GameManager(), data), seconds)
+        model_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        full = _simulate(data, seconds)
+        full_ms = (time.perf_counter() - start) * 1000
+        rows.append({'seed': base_seed + i, 'cooldown': cooldown, 'armor': armor,
+                     'model': model, 'full': full,
+                     'model_ms': model_ms, 'full_ms': full_ms})
+    return rows
+
+
+def check_long(hours, base_seed=0):
+    '''
+    Time estimate() over hours of absence for each LONG_ABSENCE_TOWERS
+    tower, against the model run without extrapolation
+    '''
+    rows = []
+    for i, (damage, cooldown, armor) in enumerate(LONG_ABSENCE_TOWERS):
+        data = _saved_game(base_seed + i, 2, cooldown, armor, damage)
+        runs = []
+        for exact_enemies in (consts.OFFLINE_EXACT_ENEMIES, None):
+            game = snapshot.restore(game_manager.GameManager(), data)
+            start = time.perf_counter()
+            progress = estimate(game, hours * 3600, exact_enemies)
+            runs.append((progress, (time.perf_counter() - start) * 1000))
+        (model, model_ms), (exact, exact_ms) = runs
+        rows.append({'damage': damage, 'cooldown': cooldown, 'armor': armor,
+                     'model': model, 'exact': exact,
+                     'model_ms': model_ms, 'exact_ms': exact_ms})
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=10, help='saves to compare from')
+    parser.add_argument('--minutes', type=float, default=10, help='absence to simulate')
+    parser.add_argument('--seed', type=int, default=0, help='first seed')
+    parser.add_argument('--hours', type=float, default=24,
+                        help='long absence to time strong towers over (0 to skip)')
+    args = parser.parse_args()
+
+    rows = check(args.games, args.minutes, args.seed)
+    long_rows = check_long(args.hours, args.seed) if args.hours else []
+
+    wave_errors = []
+    cash_errors = []
+    for row in rows:
+        model, full = row['model'], row['full']
+        wave_errors.append(abs(model['waves_cleared'] - full['waves_cleared']))
+        cash_errors.append(abs(model['cash_total'] - full['cash_total']) /
+                           max(full['cash_total'], 1))
+        print(f"seed {row['seed']} (cooldown {row['cooldown']}, health {row['armor']}): "
+              f"waves {model['waves_cleared']} vs {full['waves_cleared']}, "
+              f"cash {model['cash_total']} vs {full['cash_total']}, "
+              f"destroyed {model['tower_destroyed']} vs {full['tower_destroyed']}; "
+              f"{row['model_ms']:.1f} ms vs {row['full_ms']:.0f} ms")
+    print(f"mean wave error {np.mean(wave_errors):.2f}, "
+          f"mean cash error {100 * np.mean(cash_errors):.1f}%, "
+          f"destroyed agrees in {sum(r['model']['tower_destroyed'] == r['full']['tower_destroyed'] for r in rows)}"
+          f"/{len(rows)}, model {np.mean([r['model_ms'] for r in rows]):.1f} ms vs "
+          f"full {np.mean([r['full_ms'] for r in rows]):.0f} ms per game")
+    for row in long_rows:
+        model, exact = row['model'], row['exact']
+        print(f"{args.hours:g} h away, damage {row['damage']}, cooldown {row['cooldown']}, "
+              f"health {row['armor']}: {row['model_ms']:.0f} ms "
+              f"(extrapolated from wave {model['extrapolated_from']}) vs "
+              f"{row['exact_ms']:.0f} ms unextrapolated; "
+              f"waves {model['waves_cleared']} vs {exact['waves_cleared']}, "
+              f"cash {model['cash_total']} vs {exact['cash_total']}")
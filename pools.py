@@ -0,0 +1,140 @@
+'''Object pools for recycling short-lived game entities'''
+import pygame
+
+
+class ObjectPool:
+    '''
+    Recycles instances of cls instead of letting them be garbage collected.
+
+    Pooled classes implement reset(*args, **kwargs) to fully reinitialize
+    an instance, and have 'pool' and '_pooled' attributes. acquire() hands
+    out a released instance reset with the given arguments, or builds a new
+    one. When an instance is killed it goes back to its pool via
+    release(). With check=True every recycled instance is compared against
+    a freshly built one, and an AssertionError is raised if any state
+    carried over from its earlier use.
+    '''
+
+    def __init__(self, cls, check=False):
+        self.cls = cls
+        self.check = check
+        self.free = []                  # Released instances ready for reuse
+
+        self.created = 0                # Instances built by the pool
+        self.reused = 0                 # Acquires served from the free list
+        self.in_use = 0                 # Instances handed out, not released
+        self.high_water = 0             # Peak of in_use
+
+    def acquire(self, *args, **kwargs):
+        '''A reset instance built from args, recycled when possible'''
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            self.reused += 1
+            if self.check:
+                check_recycled(obj, self.cls(*args, **kwargs))
+        else:
+            obj = self.cls(*args, **kwargs)
+            self.created += 1
+
+        obj.pool = self
+        obj._pooled = False
+        self.in_use += 1
+        self.high_water = max(self.high_water, self.in_use)
+        return obj
+
+    def acquire_many(self, args):
+        '''
+        acquire() for a batch, given a list of positional argument tuples.
+        Recycled instances come off the free list in one slice and new ones
+        are built in one pass.
+        '''
+        if self.check:
+            return [self.acquire(*a) for a in args]
+
+        reused = min(len(args), len(self.free))
+        split = len(self.free) - reused
+        objs = self.free[split:]
+        del self.free[split:]
+        objs.reverse()                  # Same order as repeated pop()s
+        for obj, a in zip(objs, args):
+            obj.reset(*a)
+        cls = self.cls
+        objs.extend([cls(*a) for a in args[reused:]])
+        for obj in objs:
+            obj.pool = self
+            obj._pooled = False
+
+        self.reused += reused
+        self.created += len(args) - reused
+        self.in_use += len(args)
+        self.high_water = max(self.high_water, self.in_use)
+        return objs
+
+    def release(self, obj):
+        '''Return an instance to the pool (repeat releases are ignored)'''
+        if obj._pooled:
+            return
+        obj._pooled = True
+        self.free.append(obj)
+        self.in_use -= 1
+
+    def release_many(self, objs):
+        '''release() for a batch of instances'''
+        free = self.free
+        for obj in objs:
+            if not obj._pooled:
+                obj._pooled = True
+                free.append(obj)
+                self.in_use -= 1
+
+    def stats(self):
+        '''Pool size, usage and high-water mark'''
+        return {
+            'free': len(self.free),
+            'in_use': self.in_use,
+            'high_water': self.high_water,
+            'created': self.created,
+            'reused': self.reused,
+        }
+
+
+# pygame's own per-sprite attributes; group membership is checked with
+# groups() instead
+_SPRITE_ATTRIBUTES = frozenset(vars(pygame.sprite.Sprite()))
+
+
+def _state(obj):
+    '''Comparable snapshot of an instance's attributes, minus pool bookkeeping'''
+    names = set(getattr(obj, '__dict__', {}))
+    for cls in type(obj).__mro__:
+        names.update(getattr(cls, '__slots__', ()))
+    names -= {'pool', '_pooled'} | _SPRITE_ATTRIBUTES
+
+    state = {}
+    for name in names:
+        if not hasattr(obj, name):
+            continue
+        value = getattr(obj, name)
+        if isinstance(value, pygame.Rect):
+            value = tuple(value)
+        elif isinstance(value, pygame.Surface):
+            # Surfaces are shared assets, so compare by identity
+            value = id(value)
+        state[name] = value
+    return state
+
+
+def check_recycled(recycled, fresh):
+    '''Raise AssertionError if a recycled instance differs from a fresh one'''
+    if recycled.groups():
+        raise AssertionError(
+            f'recycled {type(recycled).__name__} is still in {recycled.groups()}')
+
+    recycled_state = _state(recycled)
+    fresh_state = _state(fresh)
+    stale = sorted(name for name in recycled_state.keys() | fresh_state.keys()
+                   if recycled_state.get(name) != fresh_state.get(name))
+    if stale:
+        raise AssertionError(
+            f'recycled {type(recycled).__name__} kept state: {", ".join(stale)}')
@@ -0,0 +1,109 @@
+'''Low-overhead per-phase frame profiler'''
+import csv
+import json
+import time
+from collections import deque
+import numpy as np
+import consts
+
+
+class FrameProfiler:
+    '''
+    Times the phases of each frame with lap() calls.
+
+    Between begin_frame() and end_frame(), each lap(name) charges the time
+    since the previous lap (or the frame start) to phase name. Per-phase
+    times for the last history frames are kept for histograms and the
+    on-screen overlay. Every profiled frame is also recorded for dump().
+    While disabled, each call is one attribute check.
+    '''
+
+    def __init__(self, enabled=False, history=consts.PROFILER_HISTORY,
+                 max_records=consts.PROFILER_MAX_RECORDS):
+        self.enabled = enabled
+        self.history = history
+        self.max_records = max_records
+
+        self.phases = {}                        # name -> deque of ms
+        self.frame_times = deque(maxlen=history)
+        self.records = []                       # (frame ms, {phase: ms})
+
+        self._frame_start = 0.0
+        self._last = 0.0
+        self._current = {}
+
+    def toggle(self):
+        '''Switch profiling on or off'''
+        self.enabled = not self.enabled
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame_start = self._last = time.perf_counter()
+        self._current = {}
+
+    def lap(self, name):
+        '''Charge the time since the last lap to phase name'''
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._current[name] = self._current.get(name, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start == 0.0:
+            return
+        frame_ms = (time.perf_counter() - self._frame_start) * 1000
+        self.frame_times.append(frame_ms)
+
+        # Phases skipped this frame (e.g. while paused) count as zero
+        for name in self._current.keys() - self.phases.keys():
+            self.phases[name] = deque([0.0] * (len(self.frame_times) - 1),
+                                      maxlen=self.history)
+        for name, times in self.phases.items():
+            times.append(self._current.get(name, 0.0))
+
+        if len(self.records) < self.max_records:
+            self.records.append((frame_ms, self._current))
+        self._frame_start = 0.0
+
+    def histogram(self, name, bins=20):
+        '''Counts and bin edges of recent times for a phase ('frame' for totals)'''
+        times = self.frame_times if name == 'frame' else self.phases[name]
+        return np.histogram(np.fromiter(times, float), bins=bins)
+
+    def summary(self):
+        '''Mean, p50, p99 and max ms of recent frames, per phase'''
+        series = {'frame': self.frame_times, **self.phases}
+        summary = {}
+        for name, times in series.items():
+            if not times:
+                continue
+            values = np.fromiter(times, float)
+            summary[name] = {
+                'mean_ms': round(float(values.mean()), 4),
+                'p50_ms': round(float(np.percentile(values, 50)), 4),
+                'p99_ms': round(float(np.percentile(values, 99)), 4),
+                'max_ms': round(float(values.max()), 4),
+            }
+        return summary
+
+    def dump(self, path):
+        '''Write recorded frames as CSV (by .csv extension) or JSON'''
+        names = sorted({name for _, phases in self.records for name in phases})
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['frame_ms', *names])
+                for frame_ms, phases in self.records:
+                    writer.writerow([round(frame_ms, 4),
+                                     *(round(phases.get(n, 0.0), 4) for n in names)])
+        else:
+            with open(path, 'w') as f:
+                json.dump({
+                    'summary': self.summary(),
+                    'phases': names,
+                    'frames': [{'frame_ms': round(frame_ms, 4),
+                                **{n: round(ms, 4) for n, ms in phases.items()}}
+                               for frame_ms, phases in self.records],
+                }, f)
@@ -0,0 +1,343 @@
+'''Array-backed projectile storage with a batched homing/hit kernel'''
+import numpy as np
+import pygame
+import assets
+import consts
+import drawing
+import pools
+from enemy_store import ALIVE, FREE
+from spatial import round_center
+
+# Projectile rect size and hit radius, as in units.Projectile
+SIZE = 6
+HIT_RADIUS_SQ = 25
+CULL_MARGIN = 50
+RETARGET_RADIUS = 100           # As units.RETARGET_RADIUS
+
+# Per-slot arrays saved in snapshots
+SNAPSHOT_ARRAYS = ('x', 'y', 'vx', 'vy', 'speed', 'damage', 'target',
+                   'target_gen', 'tracking', 'active')
+
+
+class ProjectileStore:
+    '''
+    Struct-of-arrays store for projectiles homing on EnemyStore enemies
+
+    Positions are kept as integer rect corners and rounded the way
+    pygame.Rect rounds, so update() produces the same hits, in the same
+    frame, as calling Projectile.update() on each shot.
+
+    Every shot's damage is added to its target's entry in the enemy
+    store's pending-damage ledger until it lands or is lost. With retarget
+    on, shots whose target dies before they land switch to the nearest
+    enemy not already doomed, or are retired at once.
+    '''
+
+    def __init__(self, enemy_store, capacity=64):
+        self.enemy_store = enemy_store
+        self.capacity = 0
+        self.count = 0                      # Projectiles in flight
+        self.top = 0                        # One past the highest used slot
+        self._free = []                     # Released slots below top
+
+        self.x = np.zeros(0, dtype=np.int64)        # Rect left
+        self.y = np.zeros(0, dtype=np.int64)        # Rect top
+        self.prev_x = np.zeros(0, dtype=np.int64)   # Rect corner before the
+        self.prev_y = np.zeros(0, dtype=np.int64)   # last update
+        self.vx = np.zeros(0)
+        self.vy = np.zeros(0)
+        self.speed = np.zeros(0)
+        self.damage = np.zeros(0)
+        self.target = np.zeros(0, dtype=np.intp)    # Enemy store slot
+        self.target_gen = np.zeros(0, dtype=np.int64)
+        self.tracking = np.zeros(0, dtype=bool)
+        self.active = np.zeros(0, dtype=bool)
+        self.views = []
+        self.view_pool = pools.ObjectPool(ProjectileView)
+        self.retarget = False               # Redirect or retire orphaned shots
+
+        # Shot outcomes
+        self.fired = 0
+        self.hits = 0                       # Shots that damaged a living enemy
+        self.overkill = 0                   # Shots that hit an enemy already dead
+        self.lost = 0                       # Shots gone without hitting anything
+        self.retargeted = 0                 # Orphaned shots given a new target
+        self.render_alpha = 1.0             # Draw this far from prev to current
+
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        '''Resize every array to hold at least capacity slots'''
+        extra = capacity - self.capacity
+        if extra <= 0:
+            return
+
+        def extend(arr):
+            return np.concatenate([arr, np.zeros(extra, dtype=arr.dtype)])
+
+        self.x = extend(self.x)
+        self.y = extend(self.y)
+        self.prev_x = extend(self.prev_x)
+        self.prev_y = extend(self.prev_y)
+        self.vx = extend(self.vx)
+        self.vy = extend(self.vy)
+        self.speed = extend(self.speed)
+        self.damage = extend(self.damage)
+        self.target = extend(self.target)
+        self.target_gen = extend(self.target_gen)
+        self.tracking = extend(self.tracking)
+        self.active = extend(self.active)
+        self.views.extend([None] * extra)
+        self.capacity = capacity
+
+    def fire(self, pos, target, speed=5, damage=10):
+        '''Launch a projectile from pos at an EnemyView and return its view'''
+        if self._free:
+            i = self._free.pop()
+        else:
+            if self.top == self.capacity:
+                self._grow(self.capacity * 2)
+            i = self.top
+            self.top += 1
+
+        self.x[i] = self.prev_x[i] = round_center(pos[0]) - SIZE // 2
+        self.y[i] = self.prev_y[i] = round_center(pos[1]) - SIZE // 2
+        self.vx[i] = 0.0
+        self.vy[i] = 0.0
+        self.speed[i] = speed
+        self.damage[i] = damage
+        self.target[i] = target.index
+        self.target_gen[i] = self.enemy_store.generation[target.index]
+        self.tracking[i] = True
+        self.active[i] = True
+        self.count += 1
+        self.fired += 1
+        self.enemy_store.pending[target.index] += damage
+
+        view = self.view_pool.acquire(self, i)
+        self.views[i] = view
+        return view
+
+    def release(self, i):
+        '''Free slot i for reuse'''
+        if not self.active[i]:
+            return
+        if self.tracking[i]:
+            # Gone before landing: take its damage off the ledger
+            self._forget(i)
+        self.active[i] = False
+        view = self.views[i]
+        self.views[i] = None
+        self.count -= 1
+        if view is not None:
+            view.remove_from_groups()
+            self.view_pool.release(view)
+
+        if self.count == 0:
+            self.top = 0
+            self._free.clear()
+        else:
+            self._free.append(i)
+
+    def snapshot(self):
+        '''Counters and packed arrays that fully describe the store'''
+        counters = {'capacity': self.capacity, 'count': self.count, 'top': self.top}
+        arrays = [getattr(self, name)[:self.top] for name in SNAPSHOT_ARRAYS]
+        arrays.append(np.array(self._free, dtype=np.int64))
+        return counters, arrays
+
+    def restore(self, counters, arrays):
+        '''Load a snapshot into this (empty) store. Returns the new views'''
+        self._grow(counters['capacity'])
+        top = counters['top']
+        for name, values in zip(SNAPSHOT_ARRAYS, arrays):
+            getattr(self, name)[:top] = values
+        self._free = arrays[len(SNAPSHOT_ARRAYS)].tolist()
+        self.prev_x[:top] = self.x[:top]
+        self.prev_y[:top] = self.y[:top]
+        self.top = top
+        self.count = counters['count']
+
+        # Rebuild the enemies' pending damage from the shots in flight
+        enemies = self.enemy_store
+        flying = np.flatnonzero(self.active[:top] & self.tracking[:top])
+        t = self.target[flying]
+        current = enemies.generation[t] == self.target_gen[flying]
+        np.add.at(enemies.pending, t[current], self.damage[flying[current]])
+
+        slots = np.flatnonzero(self.active[:top]).tolist()
+        views = self.view_pool.acquire_many([(self, i) for i in slots])
+        for i, view in zip(slots, views):
+            self.views[i] = view
+        return views
+
+    def points(self):
+        '''Pixel centers of the shots in flight, interpolated by render_alpha'''
+        slots = np.flatnonzero(self.active[:self.top])
+        alpha = self.render_alpha
+        left = self.prev_x[slots] + (self.x[slots] - self.prev_x[slots]) * alpha
+        top = self.prev_y[slots] + (self.y[slots] - self.prev_y[slots]) * alpha
+        return round_center(left) + SIZE // 2, round_center(top) + SIZE // 2
+
+    def _forget(self, i):
+        '''Take shot i's damage off its target's ledger entry'''
+        enemies = self.enemy_store
+        slot = self.target[i]
+        if enemies.state[slot] != FREE and enemies.generation[slot] == self.target_gen[i]:
+            enemies.pending[slot] -= self.damage[i]
+
+    def _retarget(self, i):
+        '''Point orphaned shot i at the nearest enemy not already doomed, or retire it'''
+        self._forget(i)
+        half = SIZE // 2
+        target = self.enemy_store.nearest((self.x[i] + half, self.y[i] + half),
+                                          RETARGET_RADIUS)
+        if target is None:
+            self.tracking[i] = False
+            self.lost += 1
+            self.release(i)
+            return
+        self.target[i] = target.index
+        self.target_gen[i] = self.enemy_store.generation[target.index]
+        self.enemy_store.pending[target.index] += self.damage[i]
+        self.retargeted += 1
+
+    def update(self):
+        '''Home, hit-test, move and cull every projectile in one pass'''
+        n = self.top
+        if self.count == 0:
+            return
+
+        enemies = self.enemy_store
+        active = self.active[:n]
+        tracking = self.tracking[:n]
+        target = self.target[:n]
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+
+        # Redirect or retire shots whose target died before they landed
+        if self.retarget:
+            orphaned = (active & tracking &
+                        ~((enemies.state[target] == ALIVE) & (enemies.health[target] > 0) &
+                          (enemies.generation[target] == self.target_gen[:n])))
+            for i in np.flatnonzero(orphaned).tolist():
+                self._retarget(i)
+            active = self.active[:n]
+
+        # Stop tracking targets that have left play
+        target_alive = ((enemies.state[target] != FREE) &
+                        (enemies.generation[target] == self.target_gen[:n]))
+        tracking &= active & target_alive
+
+        # Hit detection against current target rect centers
+        track = np.flatnonzero(tracking)
+        t = target[track]
+        dx = round_center(enemies.x[t]) - (self.x[track] + SIZE // 2)
+        dy = round_center(enemies.y[t]) - (self.y[track] + SIZE // 2)
+        dist_sq = dx * dx + dy * dy
+
+        hit = dist_sq <= HIT_RADIUS_SQ
+        health = enemies.health
+        pending = enemies.pending
+        for slot, damage in zip(t[hit].tolist(), self.damage[track[hit]].tolist()):
+            if health[slot] > 0:
+                self.hits += 1
+            else:
+                self.overkill += 1
+            health[slot] -= damage
+            pending[slot] -= damage
+        tracking[track[hit]] = False
+
+        # Update velocity to home in on target
+        steer = ~hit
+        dist = np.sqrt(dist_sq[steer])
+        homing = track[steer]
+        self.vx[homing] = self.speed[homing] * dx[steer] / dist
+        self.vy[homing] = self.speed[homing] * dy[steer] / dist
+
+        # Move everything still flying using its current velocity
+        flying = active.copy()
+        flying[track[hit]] = False
+        self.x[:n][flying] = round_center(self.x[:n][flying] + self.vx[:n][flying])
+        self.y[:n][flying] = round_center(self.y[:n][flying] + self.vy[:n][flying])
+
+        # Retire hits and anything that went off-screen
+        cx = self.x[:n] + SIZE // 2
+        cy = self.y[:n] + SIZE // 2
+        off_screen = ((cx < -CULL_MARGIN) | (cx > consts.SCREEN_WIDTH + CULL_MARGIN) |
+                      (cy < -CULL_MARGIN) | (cy > consts.SCREEN_HEIGHT + CULL_MARGIN))
+        self.lost += int(np.count_nonzero(flying & off_screen))
+        for i in np.flatnonzero(active & (~flying | off_screen)):
+            self.release(i)
+
+
+class ProjectileGroup(pygame.sprite.Group):
+    '''Sprite group of ProjectileViews whose shots live in a ProjectileStore'''
+
+    def __init__(self, store, *sprites):
+        super().__init__(*sprites)
+        self.store = store
+
+    def fire(self, pos, target, speed=5, damage=10):
+        '''Launch a projectile and add its view to this group'''
+        view = self.store.fire(pos, target, speed=speed, damage=damage)
+        self.add(view)
+        return view
+
+    def draw(self, surface, bgsurf=None, special_flags=0):
+        '''Draw at positions interpolated by the store's render_alpha'''
+        store = self.store
+        if store.render_alpha >= 1.0:
+            return super().draw(surface, bgsurf, special_flags)
+        sprites = self.sprites()
+        slots = np.fromiter((sprite.index for sprite in sprites), np.intp, len(sprites))
+        alpha = store.render_alpha
+        left = round_center(store.prev_x[slots] + (store.x[slots] - store.prev_x[slots]) * alpha)
+        top = round_center(store.prev_y[slots] + (store.y[slots] - store.prev_y[slots]) * alpha)
+        rects = [pygame.Rect(x, y, SIZE, SIZE) for x, y in zip(left.tolist(), top.tolist())]
+        return drawing.blit_group(self, surface, rects, special_flags)
+
+
+class ProjectileView(pygame.sprite.Sprite):
+    '''Sprite-compatible handle onto one ProjectileStore slot'''
+
+    __slots__ = ('store', 'index', 'image', 'pool', '_pooled')
+
+    def __init__(self, store, index):
+        super().__init__()
+        self.pool = None
+        self._pooled = False
+        self.reset(store, index)
+
+    def reset(self, store, index):
+        '''Point this view at a store slot'''
+        self.store = store
+        self.index = index
+        self.image = assets.get('projectile').base_image
+
+    @property
+    def rect(self):
+        return pygame.Rect(int(self.store.x[self.index]),
+                           int(self.store.y[self.index]), SIZE, SIZE)
+
+    @property
+    def damage(self):
+        return float(self.store.damage[self.index])
+
+    @property
+    def tracking(self):
+        return bool(self.store.tracking[self.index])
+
+    def remove_from_groups(self):
+        '''Drop out of sprite groups without touching the store'''
+        super().kill()
+
+    def kill(self):
+        '''Remove from all groups and release the store slot'''
+        if self.store.views[self.index] is self:
+            self.store.release(self.index)
+        else:
+            super().kill()
+
+    def update(self):
+        '''Movement is handled in bulk by ProjectileStore.update()'''
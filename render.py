@@ -0,0 +1,204 @@
+'''Dirty-rectangle and point-cloud renderers for the main loop'''
+from collections import deque
+import numpy as np
+import pygame as pg
+import consts
+
+
+def draw_points(surface, x, y, color, size=1):
+    '''
+    Write a size x size square of color centred on each (x, y) straight into
+    surface's pixels, in one vectorized pass. Points off the surface are
+    clipped.
+    '''
+    x = np.asarray(x, dtype=np.intp)
+    y = np.asarray(y, dtype=np.intp)
+    offsets = np.arange(size) - size // 2
+    shape = (len(x), size, size)
+    px = np.broadcast_to(x[:, None, None] + offsets[:, None], shape).ravel()
+    py = np.broadcast_to(y[:, None, None] + offsets, shape).ravel()
+    width, height = surface.get_size()
+    inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    px = px[inside]
+    py = py[inside]
+
+    if surface.get_bytesize() == 3:
+        # 24-bit surfaces have no 2D pixel view
+        pixels = pg.surfarray.pixels3d(surface)
+        pixels[px, py] = color[:3]
+    else:
+        pixels = pg.surfarray.pixels2d(surface)
+        pixels[px, py] = surface.map_rgb(color)
+    del pixels                  # Unlocks the surface
+
+
+class PointCloud:
+    '''
+    Level-of-detail drawing for huge entity counts.
+
+    Above threshold enemies and projectiles, per-sprite blits cost more than
+    the simulation, so draw() writes every entity straight into the
+    surface's pixels as a small colored stamp instead. Once the count falls
+    below threshold * hysteresis it goes back to sprites; the gap keeps it
+    from flickering between the two around the threshold. A threshold of 0
+    turns it off. Needs the array enemy engine.
+    '''
+
+    def __init__(self, threshold=consts.LOD_ENTITY_THRESHOLD,
+                 hysteresis=consts.LOD_HYSTERESIS):
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.active = False         # Drawing points this frame
+        self.switches = 0           # Times it changed mode
+
+    def update(self, game):
+        '''Pick points or sprites for this frame from game's entity count'''
+        active = False
+        if self.threshold and game.enemy_store is not None:
+            count = len(game.enemies) + len(game.projectiles)
+            if self.active:
+                active = count >= self.threshold * self.hysteresis
+            else:
+                active = count > self.threshold
+        if active != self.active:
+            self.active = active
+            self.switches += 1
+        return active
+
+    def draw(self, game, surface):
+        '''
+        Draw game's enemies and projectiles as points if update() picks
+        points. Returns False, drawing nothing, if sprites should be drawn.
+        '''
+        if not self.update(game):
+            return False
+        for group in (game.enemies, game.projectiles):
+            # No sprite rects are drawn for clear() or dirty updates
+            group.lostsprites = []
+
+        # Living enemies are drawn over dying ones
+        x, y, dying = game.enemy_store.points()
+        draw_points(surface, x[dying], y[dying], consts.LOD_DYING_COLOR,
+                    consts.LOD_ENEMY_SIZE)
+        draw_points(surface, x[~dying], y[~dying], consts.LOD_ENEMY_COLOR,
+                    consts.LOD_ENEMY_SIZE)
+        if game.projectile_store is not None:
+            x, y = game.projectile_store.points()
+            draw_points(surface, x, y, consts.LOD_PROJECTILE_COLOR,
+                        consts.LOD_PROJECTILE_SIZE)
+        return True
+
+
+class DirtyRenderer:
+    '''
+    Redraws the game but pushes only the screen regions that changed.
+
+    Each frame the previous sprite rects are erased to the background, the
+    sprites, tower and HUD are redrawn, and pg.display.update() gets the old
+    and new sprite rects plus any HUD widgets repainted this frame. Frames
+    with an overlay, a changed or added tower, or a dirty area above
+    full_update_threshold of the screen fall back to a full redraw and
+    pg.display.flip(), as do frames drawn as a point_cloud and the frame
+    after.
+    '''
+
+    def __init__(self, screen, background_color=consts.BACKGROUND_COLOR,
+                 full_update_threshold=0.4, history=600, point_cloud=None):
+        self.screen = screen
+        self.point_cloud = point_cloud
+        self.background = pg.Surface(screen.get_size())
+        self.background.fill(background_color)
+        self.full_update_threshold = full_update_threshold
+        self.screen_area = screen.get_width() * screen.get_height()
+
+        self.dirty_fraction = 1.0                   # Last frame's dirty area
+        self.fractions = deque(maxlen=history)      # Recent dirty fractions
+        self.full_updates = 0                       # Frames sent with flip()
+        self.partial_updates = 0                    # Frames sent as rects
+
+        self._tower_state = None
+        self._needs_full = True
+
+    def invalidate(self):
+        '''Force a full redraw on the next frame'''
+        self._needs_full = True
+
+    def render(self, game, interface=None, overlay=None):
+        '''Draw one frame. overlay is an optional callable(screen)'''
+        groups = (game.enemies, game.projectiles)
+        tower_state = [(tower.pos, tower.range) for tower in game.towers]
+
+        points = self.point_cloud is not None and self.point_cloud.update(game)
+
+        if (self._needs_full or overlay is not None or points or
+                tower_state != self._tower_state):
+            self._tower_state = tower_state
+            self._render_full(game, groups, interface, overlay)
+            # The next frame must also be full to erase the overlay or points
+            self._needs_full = overlay is not None or points
+            return
+
+        screen = self.screen
+
+        # Erase last frame's sprites (and sprites removed since)
+        dirty = []
+        for group in groups:
+            dirty.extend(group.lostsprites)
+            dirty.extend(rect for rect in group.spritedict.values() if rect)
+            group.clear(screen, self.background)
+
+        hud_rects = list(interface.changed_rects) if interface is not None else []
+        for rect in hud_rects:
+            screen.blit(self.background, rect, rect)
+        dirty.extend(hud_rects)
+
+        # Redraw everything; only the dirty rects get pushed
+        for group in groups:
+            group.draw(screen)
+            dirty.extend(rect for rect in group.spritedict.values() if rect)
+        for tower in game.towers:
+            tower.draw(screen)
+
+        if interface is not None:
+            for rect in dirty:
+                screen.blit(interface.image, rect, rect)
+
+        # Overlapping rects are counted twice, so this is an upper bound
+        area = sum(rect.width * rect.height for rect in dirty)
+        fraction = min(1.0, area / self.screen_area)
+        self._record(fraction)
+
+        if fraction > self.full_update_threshold:
+            pg.display.flip()
+            self.full_updates += 1
+        else:
+            pg.display.update(dirty)
+            self.partial_updates += 1
+
+    def _render_full(self, game, groups, interface, overlay):
+        screen = self.screen
+        screen.blit(self.background, (0, 0))
+        if self.point_cloud is None or not self.point_cloud.draw(game, screen):
+            for group in groups:
+                group.lostsprites = []
+                group.draw(screen)
+        for tower in game.towers:
+            tower.draw(screen)
+        if interface is not None:
+            interface.draw(screen)
+        if overlay is not None:
+            overlay(screen)
+
+        pg.display.flip()
+        self.full_updates += 1
+        self._record(1.0)
+
+    def _record(self, fraction):
+        self.dirty_fraction = fraction
+        self.fractions.append(fraction)
+
+    def mean_dirty_fraction(self):
+        '''Average dirty fraction over recent frames'''
+        if not self.fractions:
+            return 0.0
+        return sum(self.fractions) / len(self.fractions)
@@ -0,0 +1,182 @@
+'''
+Deterministic input recording and headless replay
+
+A recording is a short header (magic, version and the JSON game settings
+from GameManager.replay_config()) followed by fixed-size records of
+(tick, input). Inputs are game starts, the pause toggle, resets and tower
+upgrades, stamped with the number of updates the game had run when they
+happened.
+Every REPLAY_CHECKPOINT_INTERVAL ticks a checksum of the game state is
+recorded too, so a replay can tell where it diverged:
+
+    python main.py --record run.tdr
+    python replay.py run.tdr
+'''
+import argparse
+import json
+import struct
+import sys
+import time
+import zlib
+import consts
+import game_manager
+import telemetry
+from sim_clock import SimClock
+
+MAGIC = b'TDRP'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sBH')        # magic, version, settings length
+_RECORD = struct.Struct('<IB')          # tick, input code
+_CHECKSUM = struct.Struct('<I')         # follows CHECKPOINT records
+
+# Input codes
+(END, CHECKPOINT, START, TOGGLE_PAUSE, RESET,
+ UPGRADE_DAMAGE, UPGRADE_SPEED, UPGRADE_ARMOR) = range(8)
+
+INPUTS = {
+    START: 'start_game',
+    TOGGLE_PAUSE: 'toggle_pause',
+    RESET: 'reset_game',
+    UPGRADE_DAMAGE: 'upgrade_tower_damage',
+    UPGRADE_SPEED: 'upgrade_tower_speed',
+    UPGRADE_ARMOR: 'upgrade_tower_armor',
+}
+CODES = {name: code for code, name in INPUTS.items()}
+
+
+class ReplayMismatch(Exception):
+    '''A replayed game diverged from its recording'''
+
+
+def state_checksum(game):
+    '''CRC32 of the game state a replay must reproduce'''
+    tower = game.tower
+    state = (game.wave_number, game.cash, game.paused, game.game_over,
+             tower.health, tower.max_health, tower.damage, tower.cooldown,
+             len(game.enemies), sum(enemy.health for enemy in game.enemies),
+             len(game.projectiles))
+    return zlib.crc32(repr(state).encode())
+
+
+class ReplayRecorder:
+    '''Streams a game's inputs to a recording file as they happen'''
+
+    def __init__(self, path, config,
+                 checkpoint_interval=consts.REPLAY_CHECKPOINT_INTERVAL):
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.ticks = 0                  # Updates run so far
+        self.inputs = 0                 # Inputs recorded so far
+
+        settings = json.dumps(config, separators=(',', ':')).encode()
+        self.file = open(path, 'wb')
+        self.file.write(_HEADER.pack(MAGIC, VERSION, len(settings)) + settings)
+
+    def record(self, name):
+        '''Record a GameManager input method call for the current tick'''
+        self.file.write(_RECORD.pack(self.ticks, CODES[name]))
+        self.inputs += 1
+
+    def on_tick(self, game):
+        '''Called at the start of every GameManager.update()'''
+        if self.checkpoint_interval and self.ticks % self.checkpoint_interval == 0:
+            self.file.write(_RECORD.pack(self.ticks, CHECKPOINT) +
+                            _CHECKSUM.pack(state_checksum(game)))
+            self.file.flush()
+        self.ticks += 1
+
+    def close(self):
+        '''Mark the end of the recording and close the file'''
+        if self.file.closed:
+            return
+        self.file.write(_RECORD.pack(self.ticks, END))
+        self.file.close()
+
+
+def read_header(f):
+    '''Game settings from an open recording, leaving f at the first record'''
+    magic, version, length = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f'{f.name} is not a replay recording')
+    if version != VERSION:
+        raise ValueError(f'unsupported replay version {version}')
+    return json.loads(f.read(length))
+
+
+def read_records(f):
+    '''Yield (tick, code, checksum) records until END or end of file'''
+    while True:
+        data = f.read(_RECORD.size)
+        if len(data) < _RECORD.size:
+            return                      # Truncated recording, e.g. a crash
+        tick, code = _RECORD.unpack(data)
+        checksum = None
+        if code == CHECKPOINT:
+            checksum, = _CHECKSUM.unpack(f.read(_CHECKSUM.size))
+        yield tick, code, checksum
+        if code == END:
+            return
+
+
+def replay(path, verify=True, profiler=None, telemetry_bus=None):
+    '''
+    Re-run a recording headless, as fast as possible.
+
+    Returns the replayed GameManager and the number of ticks run. With
+    verify, raises ReplayMismatch at the first checkpoint whose state
+    differs from the recording.
+    '''
+    with open(path, 'rb') as f:
+        config = read_header(f)
+        game = game_manager.GameManager(
+            clock=SimClock(config['fps']),
+            enemy_engine=config['enemy_engine'],
+            projectile_engine=config['projectile_engine'],
+            spawn_budget=config['spawn_budget'],
+            profiler=profiler,
+            seed=config['seed'],
+            telemetry_bus=telemetry_bus,
+            ledger=config.get('ledger', False))
+
+        ticks = 0
+        for tick, code, checksum in read_records(f):
+            while ticks < tick:
+                game.update()
+                ticks += 1
+            if code == CHECKPOINT:
+                if verify and state_checksum(game) != checksum:
+                    raise ReplayMismatch(f'state diverged before tick {tick}')
+            elif code != END:
+                getattr(game, INPUTS[code])()
+    return game, ticks
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('recording', help='file written by main.py --record')
+    parser.add_argument('--no-verify', action='store_true',
+                        help='skip the state checksum checks')
+    parser.add_argument('--verbose', action='store_true',
+                        help="show the game's own output while replaying")
+    args = parser.parse_args()
+
+    bus = telemetry.EventBus()
+    if args.verbose:
+        bus.add_sink(telemetry.StdoutSink())
+        bus.start()
+
+    start = time.perf_counter()
+    try:
+        game, ticks = replay(args.recording, verify=not args.no_verify,
+                             telemetry_bus=bus)
+    except ReplayMismatch as e:
+        sys.exit(f'Replay mismatch: {e}')
+    finally:
+        bus.close()
+    elapsed = time.perf_counter() - start
+
+    print(f'Replayed {ticks} ticks in {elapsed:.2f}s '
+          f'({ticks / max(elapsed, 1e-9):.0f} ticks/s): wave {game.wave_number}, '
+          f'cash ${game.cash}, tower health {game.tower.health}')
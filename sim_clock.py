@@ -0,0 +1,81 @@
+'''Clocks driving GameManager timing'''
+import time
+import pygame as pg
+import consts
+
+
+class WallClock:
+    '''Clock backed by pygame's real-time millisecond timer'''
+
+    def tick(self):
+        '''Wall time advances on its own'''
+
+    def get_ticks(self):
+        '''Milliseconds since pygame.init()'''
+        return pg.time.get_ticks()
+
+
+class SimClock:
+    '''Fixed-timestep clock advanced explicitly by the simulation'''
+
+    def __init__(self, fps=consts.FPS):
+        self.fps = fps              # Simulated ticks per second
+        self.tick_count = 0         # Ticks simulated so far
+
+    def tick(self):
+        '''Advance the clock by one fixed tick'''
+        self.tick_count += 1
+
+    def get_ticks(self):
+        '''Simulated milliseconds elapsed'''
+        return self.tick_count * 1000 // self.fps
+
+
+class FixedTimestep:
+    '''
+    Accumulator that decouples simulation ticks from rendered frames.
+
+    Each frame, advance() adds the real time elapsed, scaled by the speed
+    multiplier, and runs one fixed tick per whole tick interval owed. At
+    most max_ticks are run per frame, and no more once budget_ms of real
+    time has gone on ticks; any backlog past that is dropped, so slow
+    frames make the game run slower rather than snowball. alpha is how far
+    the leftover time reaches into the next tick, for interpolating what
+    is drawn.
+    '''
+
+    def __init__(self, fps=consts.FPS, speed=1, max_ticks=consts.MAX_TICKS_PER_FRAME,
+                 budget_ms=consts.SIM_BUDGET_MS, max_frame_ms=consts.MAX_FRAME_MS):
+        self.tick_ms = 1000 / fps
+        self.speed = speed
+        self.max_ticks = max_ticks
+        self.budget_ms = budget_ms
+        self.max_frame_ms = max_frame_ms
+
+        self.accumulator = 0.0          # Real ms owed to the simulation
+        self.ticks = 0                  # Ticks run last frame
+        self.dropped = 0                # Ticks skipped to catch up
+
+    def advance(self, frame_ms, step):
+        '''Call step() once per tick owed after frame_ms. Returns ticks run'''
+        self.accumulator += min(frame_ms, self.max_frame_ms) * self.speed
+        start = time.perf_counter()
+        ticks = 0
+        while self.accumulator >= self.tick_ms:
+            if (ticks >= self.max_ticks or
+                    (time.perf_counter() - start) * 1000 > self.budget_ms):
+                # Too far behind: give up the backlog rather than spiral
+                owed = int(self.accumulator // self.tick_ms)
+                self.dropped += owed
+                self.accumulator -= owed * self.tick_ms
+                break
+            step()
+            ticks += 1
+            self.accumulator -= self.tick_ms
+        self.ticks = ticks
+        return ticks
+
+    @property
+    def alpha(self):
+        '''Fraction of a tick since the last one, in [0, 1)'''
+        return self.accumulator / self.tick_ms
@@ -0,0 +1,209 @@
+'''
+Compact binary snapshots of the full game state
+
+A snapshot is a short header (magic, version, flags and the length of a
+JSON block) followed by the JSON block and one blob of packed arrays. The
+JSON holds the game settings, scalar state (cash, wave timers, tower stats,
+RNG state), the time of saving and the dtype and length of every array;
+the blob holds the enemy and projectile store arrays back to back,
+optionally zlib compressed. No sprites are pickled: restoring refills the
+stores and builds fresh views onto them.
+
+Snapshots need the array enemy and projectile engines.
+'''
+import json
+import struct
+import time
+import zlib
+import numpy as np
+from sim_clock import SimClock
+
+MAGIC = b'TDSV'
+VERSION = 1
+COMPRESSED = 1                          # Header flag: array blob is zlib'd
+
+_HEADER = struct.Struct('<4sBBI')       # magic, version, flags, JSON length
+
+# Tower attributes saved as they are
+TOWER_FIELDS = ('health', 'max_health', 'regen', 'damage', 'range',
+                'cooldown', 'cooldown_count', 'cash')
+EXTRA_TOWER_FIELDS = ('damage', 'range', 'cooldown', 'cooldown_count')
+
+
+def snapshot(game, compress=False):
+    '''Serialize the game's full state to bytes'''
+    if game.enemy_store is None or game.projectile_store is None:
+        raise ValueError('snapshots need the array enemy and projectile engines')
+
+    enemy_counters, enemy_arrays = game.enemy_store.snapshot()
+    projectile_counters, projectile_arrays = game.projectile_store.snapshot()
+    arrays = enemy_arrays + projectile_arrays
+
+    now = game.clock.get_ticks()
+    state = {
+        'saved_at': time.time(),
+        'config': {
+            'seed': game.seed,
+            'enemy_engine': game.enemy_engine,
+            'projectile_engine': game.projectile_engine,
+            'spawn_budget': game.spawner.budget,
+            'ledger': game.ledger,
+        },
+        'game': {
+            'running': game.running,
+            'paused': game.paused,
+            'game_over': game.game_over,
+            'cash': game.cash,
+            'wave_number': game.wave_number,
+            'waiting_for_next_wave': game.waiting_for_next_wave,
+            'wave_elapsed_ms': now - game.last_wave_time,
+            'clock_ticks': getattr(game.clock, 'tick_count', None),
+            'pending_spawns': game.spawner.pending,
+        },
+        'rng': game.rng.bit_generator.state,
+        'tower': _tower_state(game.tower, TOWER_FIELDS),
+        'towers': [{'pos': list(tower.pos), **_tower_state(tower, EXTRA_TOWER_FIELDS)}
+                   for tower in game.towers[1:]],
+        'enemies': enemy_counters,
+        'projectiles': projectile_counters,
+        'arrays': [[a.dtype.str, len(a)] for a in arrays],
+        'enemy_array_count': len(enemy_arrays),
+    }
+
+    blob = b''.join(np.ascontiguousarray(a).tobytes() for a in arrays)
+    flags = 0
+    if compress:
+        blob = zlib.compress(blob, 1)
+        flags |= COMPRESSED
+    meta = json.dumps(state, separators=(',', ':')).encode()
+    return _HEADER.pack(MAGIC, VERSION, flags, len(meta)) + meta + blob
+
+
+def restore(game, data):
+    '''
+    Replace the game's state, in place, with a snapshot from snapshot().
+
+    The game keeps its screen, clock, profiler and telemetry bus. Any input
+    recording is dropped, since a replay could not reproduce the jump.
+    '''
+    flags, state, blob = _unpack(data)
+    if flags & COMPRESSED:
+        blob = zlib.decompress(blob)
+
+    # Unpack the array blob without copying
+    arrays = []
+    position = 0
+    for dtype, length in state['arrays']:
+        array = np.frombuffer(blob, dtype=dtype, count=length, offset=position)
+        arrays.append(array)
+        position += array.nbytes
+    split = state['enemy_array_count']
+
+    # Start from a fresh game with the saved settings, keeping the old
+    # game's view pools so restoring over a running game reuses its views
+    view_pools = _release_views(game)
+    config = state['config']
+    game.__init__(game.screen, game.clock, config['enemy_engine'],
+                  config['projectile_engine'], config['spawn_budget'],
+                  game.profiler, config['seed'], game.telemetry,
+                  config.get('ledger', False))
+    if game.enemy_store is None or game.projectile_store is None:
+        raise ValueError('snapshots need the array enemy and projectile engines')
+    if view_pools is not None:
+        game.enemy_store.view_pool, game.projectile_store.view_pool = view_pools
+
+    saved = state['game']
+    game.running = saved['running']
+    game.paused = saved['paused']
+    game.game_over = saved['game_over']
+    game.cash = saved['cash']
+    game.wave_number = saved['wave_number']
+    game.waiting_for_next_wave = saved['waiting_for_next_wave']
+    game.spawner.pending = saved['pending_spawns']
+    game.rng.bit_generator.state = state['rng']
+
+    # Wave timers are kept relative to the clock, which may be a new one
+    if saved['clock_ticks'] is not None and isinstance(game.clock, SimClock):
+        game.clock.tick_count = saved['clock_ticks']
+    game.last_wave_time = game.clock.get_ticks() - saved['wave_elapsed_ms']
+
+    enemies = game.enemy_store.restore(state['enemies'], arrays[:split])
+    _add_all((game.enemies, game.all_sprites), enemies)
+    _add_all((game.projectiles,),
+             game.projectile_store.restore(state['projectiles'], arrays[split:]))
+
+    _restore_tower(game, game.tower, state['tower'], TOWER_FIELDS)
+    for saved in state.get('towers', []):
+        _restore_tower(game, game.add_tower(tuple(saved['pos'])), saved,
+                       EXTRA_TOWER_FIELDS)
+    return game
+
+
+def _tower_state(tower, fields):
+    target = tower.current_target
+    return {**{name: getattr(tower, name) for name in fields},
+            'target': target.index if target is not None else None}
+
+
+def _restore_tower(game, tower, saved, fields):
+    for name in fields:
+        setattr(tower, name, saved[name])
+    if saved['target'] is not None:
+        tower.current_target = game.enemy_store.views[saved['target']]
+
+
+def _unpack(data):
+    '''Header flags, JSON state and array blob of a snapshot'''
+    magic, version, flags, meta_length = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a game snapshot')
+    if version != VERSION:
+        raise ValueError(f'unsupported snapshot version {version}')
+    offset = _HEADER.size
+    state = json.loads(data[offset:offset + meta_length])
+    return flags, state, data[offset + meta_length:]
+
+
+def _release_views(game):
+    '''Return every store view to its pool, and the pools, if game has stores'''
+    stores = (getattr(game, 'enemy_store', None),
+              getattr(game, 'projectile_store', None))
+    if None in stores:
+        return None
+    # The old groups are discarded whole, so only the views need to forget
+    # them before they are pooled
+    for group in (game.enemies, game.projectiles, game.all_sprites):
+        for sprite in group.sprites():
+            sprite.remove_internal(group)
+    for store in stores:
+        store.view_pool.release_many([view for view in store.views if view is not None])
+    return tuple(store.view_pool for store in stores)
+
+
+def _add_all(groups, sprites):
+    '''Group.add() for sprites known to be new, without its per-sprite checks'''
+    for group in groups:
+        group.spritedict.update(dict.fromkeys(sprites))
+        for sprite in sprites:
+            sprite.add_internal(group)
+
+
+def save(game, path, compress=True):
+    '''Write a snapshot of the game to path'''
+    with open(path, 'wb') as f:
+        f.write(snapshot(game, compress))
+
+
+def load(game, path):
+    '''Restore the game in place from a snapshot file'''
+    with open(path, 'rb') as f:
+        return restore(game, f.read())
+
+
+def saved_time(path):
+    '''When the snapshot at path was saved, as a time.time() timestamp'''
+    with open(path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        _, _, _, meta_length = _HEADER.unpack(header)
+        _, state, _ = _unpack(header + f.read(meta_length))
+    return state.get('saved_at')
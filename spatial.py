@@ -0,0 +1,106 @@
+'''Uniform-grid spatial index for radius queries over point arrays'''
+import numpy as np
+
+
+def round_center(v):
+    '''Round like pygame.Rect does when given float coordinates'''
+    return np.sign(v) * np.floor(np.abs(v) + 0.5)
+
+
+class SpatialGrid:
+    '''
+    Buckets points into square cells so a radius query only looks at the
+    cells overlapping the query circle.
+
+    build() takes the point arrays and the slot indices to index. Points are
+    sorted by cell key, so each cell is a contiguous run found by binary
+    search.
+    '''
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.index = np.zeros(0, dtype=np.intp)    # Slot ids sorted by cell
+        self.keys = np.zeros(0, dtype=np.int64)    # Cell key of each entry
+        self.x_min = 0
+        self.y_min = 0
+        self.rows = 1
+
+    def __len__(self):
+        return len(self.index)
+
+    def build(self, x, y, slots):
+        '''Index the points x[slots], y[slots]'''
+        slots = np.asarray(slots, dtype=np.intp)
+        if len(slots) == 0:
+            self.index = slots
+            self.keys = np.zeros(0, dtype=np.int64)
+            return
+
+        cx = np.floor(x[slots] / self.cell_size).astype(np.int64)
+        cy = np.floor(y[slots] / self.cell_size).astype(np.int64)
+        self.x_min = int(cx.min())
+        self.y_min = int(cy.min())
+        self.rows = int(cy.max()) - self.y_min + 1
+
+        keys = (cx - self.x_min) * self.rows + (cy - self.y_min)
+        order = np.argsort(keys, kind='stable')
+        self.index = slots[order]
+        self.keys = keys[order]
+
+    def query(self, x, y, radius):
+        '''Slot ids in every cell overlapping the circle at (x, y)'''
+        if len(self.index) == 0:
+            return self.index
+
+        cs = self.cell_size
+        x0 = max(int(np.floor((x - radius) / cs)) - self.x_min, 0)
+        x1 = int(np.floor((x + radius) / cs)) - self.x_min
+        y0 = max(int(np.floor((y - radius) / cs)) - self.y_min, 0)
+        y1 = min(int(np.floor((y + radius) / cs)) - self.y_min, self.rows - 1)
+        if x1 < x0 or y1 < y0:
+            return self.index[:0]
+
+        # Each grid column is one contiguous key range [y0, y1]
+        cols = np.arange(x0, x1 + 1, dtype=np.int64) * self.rows
+        starts = np.searchsorted(self.keys, cols + y0, side='left')
+        ends = np.searchsorted(self.keys, cols + y1, side='right')
+        runs = [self.index[s:e] for s, e in zip(starts, ends) if e > s]
+        if not runs:
+            return self.index[:0]
+        return np.concatenate(runs)
+
+    def query_many(self, xs, ys, radii):
+        '''
+        query() for many circles at once. Returns parallel arrays of the
+        circle number and slot id of every (circle, slot) candidate pair.
+        '''
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        radii = np.broadcast_to(np.asarray(radii, dtype=float), xs.shape)
+        empty = np.zeros(0, dtype=np.intp)
+        if len(self.index) == 0 or len(xs) == 0:
+            return empty, empty
+
+        cs = self.cell_size
+        x0 = np.maximum(np.floor((xs - radii) / cs).astype(np.int64) - self.x_min, 0)
+        x1 = np.floor((xs + radii) / cs).astype(np.int64) - self.x_min
+        y0 = np.maximum(np.floor((ys - radii) / cs).astype(np.int64) - self.y_min, 0)
+        y1 = np.minimum(np.floor((ys + radii) / cs).astype(np.int64) - self.y_min,
+                        self.rows - 1)
+        columns = np.where((x1 >= x0) & (y1 >= y0), x1 - x0 + 1, 0)
+
+        # One contiguous key range per (circle, grid column)
+        owner = np.repeat(np.arange(len(xs)), columns)
+        first = np.cumsum(columns) - columns
+        cols = x0[owner] + np.arange(len(owner)) - np.repeat(first, columns)
+        starts = np.searchsorted(self.keys, cols * self.rows + y0[owner], side='left')
+        ends = np.searchsorted(self.keys, cols * self.rows + y1[owner], side='right')
+
+        # Expand the runs into one entry per candidate
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return empty, empty
+        run_first = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - run_first, lengths) + np.arange(total)
+        return np.repeat(owner, lengths), self.index[positions]
@@ -0,0 +1,97 @@
+'''Batched enemy spawn sampling and frame-spread wave spawning'''
+import numpy as np
+import consts
+
+
+class SpawnRegion:
+    '''
+    The area enemies may spawn in: a rectangle around the tower, minus a
+    disk of exclusion_radius around it.
+
+    Points are drawn uniformly from that area with no rejection loop. In
+    polar coordinates around the tower the allowed radii at angle theta
+    are [exclusion_radius, R(theta)], where R is the distance to the
+    rectangle edge. The angle is sampled from a tabulated CDF proportional
+    to R(theta)**2 - exclusion_radius**2, and the radius by inverting the
+    area CDF along that ray.
+    '''
+
+    def __init__(self, center, exclusion_radius=consts.SPAWN_EXCLUSION_RADIUS,
+                 bounds=None, resolution=4096):
+        if bounds is None:
+            bounds = (-0.5 * consts.SCREEN_WIDTH, -0.5 * consts.SCREEN_HEIGHT,
+                      1.5 * consts.SCREEN_WIDTH, 1.5 * consts.SCREEN_HEIGHT)
+        self.center = center
+        self.exclusion_radius = exclusion_radius
+        self.bounds = bounds
+
+        # Tabulate the angle CDF once
+        theta = np.linspace(-np.pi, np.pi, resolution + 1)
+        mid = 0.5 * (theta[1:] + theta[:-1])
+        weight = np.maximum(self._edge_distance(mid)**2 - exclusion_radius**2, 0)
+        cdf = np.concatenate([[0.0], np.cumsum(weight)])
+        self._theta = theta
+        self._cdf = cdf / cdf[-1]
+
+    def _edge_distance(self, theta):
+        '''Distance from the center to the bounds along each angle'''
+        cx, cy = self.center
+        x0, y0, x1, y1 = self.bounds
+        cos = np.cos(theta)
+        sin = np.sin(theta)
+        with np.errstate(divide='ignore'):
+            tx = np.where(cos > 0, (x1 - cx) / cos, (x0 - cx) / cos)
+            ty = np.where(sin > 0, (y1 - cy) / sin, (y0 - cy) / sin)
+        return np.minimum(np.abs(tx), np.abs(ty))
+
+    def sample(self, n, rng):
+        '''n points drawn uniformly from the region, as x and y arrays'''
+        return self._place(rng.random(n), rng.random(n))
+
+    def sample_batches(self, n, budget, rng):
+        '''
+        n points, the same as successive sample() calls of at most budget
+        points each would draw from rng, in one pass
+        '''
+        if not budget or n <= budget:
+            return self.sample(n, rng)
+        # Each sample() call draws its angles, then its radii
+        full, rest = divmod(n, budget)
+        u = rng.random(2 * n)
+        blocks = u[:2 * budget * full].reshape(full, 2, budget)
+        tail = u[2 * budget * full:]
+        return self._place(np.concatenate([blocks[:, 0].ravel(), tail[:rest]]),
+                           np.concatenate([blocks[:, 1].ravel(), tail[rest:]]))
+
+    def _place(self, angle_u, radius_u):
+        '''Points for uniform draws of the angle and radius CDFs'''
+        theta = np.interp(angle_u, self._cdf, self._theta)
+        r_min_sq = self.exclusion_radius**2
+        r_max_sq = np.maximum(self._edge_distance(theta)**2, r_min_sq)
+        radius = np.sqrt(r_min_sq + radius_u * (r_max_sq - r_min_sq))
+        return (self.center[0] + radius * np.cos(theta),
+                self.center[1] + radius * np.sin(theta))
+
+
+class WaveSpawner:
+    '''
+    Queues wave spawns and hands them out in per-tick batches of at most
+    budget points, so a big wave streams in over several frames. A budget
+    of None spawns each queued wave in a single batch.
+    '''
+
+    def __init__(self, region, budget=consts.SPAWN_BUDGET_PER_TICK, rng=None):
+        self.region = region
+        self.budget = budget
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.pending = 0                    # Enemies queued but not spawned
+
+    def queue(self, count):
+        '''Add count enemies to the spawn queue'''
+        self.pending += count
+
+    def take(self):
+        '''Spawn points for this tick's batch (possibly empty)'''
+        n = self.pending if self.budget is None else min(self.pending, self.budget)
+        self.pending -= n
+        return self.region.sample(n, self.rng)
@@ -0,0 +1,79 @@
+'''Pre-rendered rotation and fade frames for sprites'''
+import pygame
+import consts
+
+
+class FrameCache:
+    '''
+    Rotated and faded copies of one base image, keyed by quantized angle
+    and alpha step.
+
+    Frames are rendered the first time they are asked for and then reused,
+    so sprites swap in a cached Surface instead of allocating one per frame.
+    Once max_frames are stored, frames that don't fit are rendered without
+    being cached.
+    '''
+
+    def __init__(self, base_image, angle_step=consts.FRAME_ANGLE_STEP,
+                 alpha_steps=consts.FRAME_ALPHA_STEPS,
+                 max_frames=consts.FRAME_CACHE_MAX_FRAMES):
+        self.base_image = base_image
+        self.angle_step = angle_step        # Degrees between cached angles
+        self.alpha_steps = alpha_steps      # Fade levels between 0 and 255
+        self.max_frames = max_frames        # Upper bound on cached frames
+
+        self.frames = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, angle, alpha=255):
+        '''Quantized (angle index, alpha index) for an angle in degrees'''
+        angle_index = round(angle / self.angle_step) % round(360 / self.angle_step)
+        alpha_index = round(max(0, min(255, alpha)) * self.alpha_steps / 255)
+        return angle_index, alpha_index
+
+    def frame(self, angle, alpha=255):
+        '''Cached image rotated by angle degrees and faded to alpha'''
+        key = self.key(angle, alpha)
+        image = self.frames.get(key)
+        if image is not None:
+            self.hits += 1
+            return image
+
+        self.misses += 1
+        image = self._render(*key)
+        if len(self.frames) < self.max_frames:
+            self.frames[key] = image
+        return image
+
+    def prebuild(self):
+        '''Render every frame up front, up to max_frames'''
+        for angle_index in range(round(360 / self.angle_step)):
+            for alpha_index in range(self.alpha_steps + 1):
+                if len(self.frames) >= self.max_frames:
+                    return
+                key = (angle_index, alpha_index)
+                if key not in self.frames:
+                    self.frames[key] = self._render(*key)
+
+    def _render(self, angle_index, alpha_index):
+        image = pygame.transform.rotate(self.base_image,
+                                        angle_index * self.angle_step)
+        if alpha_index < self.alpha_steps:
+            image.set_alpha(round(alpha_index * 255 / self.alpha_steps))
+        return image
+
+    def memory_bytes(self):
+        '''Pixel memory held by cached frames'''
+        return sum(image.get_width() * image.get_height() * image.get_bytesize()
+                   for image in self.frames.values())
+
+    def stats(self):
+        '''Cache size, pixel memory and hit counts'''
+        return {
+            'frames': len(self.frames),
+            'max_frames': self.max_frames,
+            'bytes': self.memory_bytes(),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
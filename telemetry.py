@@ -0,0 +1,216 @@
+'''
+Buffered structured telemetry
+
+Game code emits events (kills, wave spawns, upgrades, tower damage, game
+over) to an EventBus. emit() only appends a tuple to a ring buffer; a
+background thread drains the buffer to the bus's sinks, so the game loop
+never waits on I/O. Events can be filtered by level and sampled per kind,
+both on the bus and per sink.
+'''
+import json
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque, Counter
+import consts
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING'}
+
+
+class EventBus:
+    '''
+    Ring-buffered event bus drained to sinks by a background thread.
+
+    level drops events below it at emit time. sample maps an event kind
+    to N, keeping only every Nth event of that kind. When the buffer is
+    full the oldest events are overwritten and counted in dropped. A bus
+    with no sinks discards events immediately.
+    '''
+
+    def __init__(self, level=INFO, sample=None, capacity=consts.TELEMETRY_BUFFER_SIZE,
+                 flush_interval=consts.TELEMETRY_FLUSH_INTERVAL):
+        self.level = level
+        self.sample = dict(sample or {})
+        self.flush_interval = flush_interval
+        self.sinks = []
+
+        self.buffer = deque(maxlen=capacity)
+        self.emitted = 0                # Events accepted into the buffer
+        self.dropped = 0                # Events overwritten before draining
+        self.sink_errors = 0            # Exceptions raised by sinks
+
+        self._counts = Counter()        # Events seen per sampled kind
+        self._thread = None
+        self._stop = threading.Event()
+        self._drain_lock = threading.Lock()
+
+    def add_sink(self, sink):
+        '''Send future events to sink'''
+        self.sinks.append(sink)
+        return sink
+
+    def emit(self, kind, level=INFO, **fields):
+        '''Queue an event; never blocks'''
+        if level < self.level or not self.sinks:
+            return
+        every = self.sample.get(kind)
+        if every is not None:
+            self._counts[kind] += 1
+            if self._counts[kind] % every:
+                return
+        buffer = self.buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1
+        buffer.append((time.time(), level, kind, fields))
+        self.emitted += 1
+
+    def start(self):
+        '''Start the background drain thread'''
+        if self._thread is not None:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.drain()
+
+    def drain(self):
+        '''Hand every buffered event to the sinks'''
+        with self._drain_lock:
+            batch = []
+            buffer = self.buffer
+            while buffer:
+                batch.append(buffer.popleft())
+            if not batch:
+                return
+            for sink in self.sinks:
+                try:
+                    sink.write(batch)
+                except Exception:
+                    self.sink_errors += 1
+
+    def close(self):
+        '''Stop the drain thread, flush what is left and close the sinks'''
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.drain()
+        for sink in self.sinks:
+            sink.close()
+
+
+class Sink(ABC):
+    '''
+    Base sink: filters a batch by level and per-kind sampling. Subclasses
+    implement write()
+    '''
+
+    def __init__(self, level=DEBUG, sample=None):
+        self.level = level
+        self.sample = dict(sample or {})
+        self._counts = Counter()
+
+    def _accept(self, batch):
+        for event in batch:
+            ts, level, kind, fields = event
+            if level < self.level:
+                continue
+            every = self.sample.get(kind)
+            if every is not None:
+                self._counts[kind] += 1
+                if self._counts[kind] % every:
+                    continue
+            yield event
+
+    @abstractmethod
+    def write(self, batch):
+        '''Handle a batch of (timestamp, level, kind, fields) events'''
+
+    def close(self):
+        '''Release any resources'''
+
+
+class JSONLSink(Sink):
+    '''Appends one JSON object per event to a file'''
+
+    def __init__(self, path, level=DEBUG, sample=None):
+        super().__init__(level, sample)
+        self.file = open(path, 'a')
+
+    def write(self, batch):
+        lines = [json.dumps({'ts': round(ts, 6), 'level': LEVEL_NAMES.get(level, level),
+                             'event': kind, **fields}, separators=(',', ':'))
+                 for ts, level, kind, fields in self._accept(batch)]
+        if lines:
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class MemorySink(Sink):
+    '''
+    In-memory aggregator: event counts and numeric field totals per kind,
+    plus the most recent events.
+    '''
+
+    def __init__(self, level=DEBUG, sample=None, recent=1000):
+        super().__init__(level, sample)
+        self.counts = Counter()
+        self.totals = {}                # kind -> Counter of numeric fields
+        self.recent = deque(maxlen=recent)
+
+    def write(self, batch):
+        for event in self._accept(batch):
+            ts, level, kind, fields = event
+            self.counts[kind] += 1
+            totals = self.totals.setdefault(kind, Counter())
+            for name, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[name] += value
+            self.recent.append(event)
+
+    def summary(self):
+        '''Counts and field totals per event kind'''
+        return {kind: {'count': count, **self.totals.get(kind, {})}
+                for kind, count in self.counts.items()}
+
+
+class StdoutSink(Sink):
+    '''Prints the game's console messages for events that have one'''
+
+    MESSAGES = {
+        'wave_spawned': 'Spawning wave {wave} with {count} enemies',
+        'enemy_killed': 'Enemy killed! Awarded ${bounty}',
+        'game_over': 'GAME OVER - Tower Destroyed!',
+        'upgrade_damage': 'Damage upgraded to {damage}. Remaining cash: ${cash}',
+        'upgrade_speed': 'Speed upgraded! Cooldown: {cooldown}. Remaining cash: ${cash}',
+        'upgrade_armor': 'Armor upgraded! Max health: {max_health}. Remaining cash: ${cash}',
+        'upgrade_unaffordable': 'Not enough cash! Need ${cost}, have ${cash}',
+        'upgrade_maxed': 'Speed already at maximum!',
+        'offline_progress': 'While you were away: cleared {waves} waves and earned ${cash}',
+    }
+
+    def __init__(self, level=INFO, sample=None, stream=None):
+        super().__init__(level, sample)
+        self.stream = stream
+
+    def write(self, batch):
+        lines = []
+        for ts, level, kind, fields in self._accept(batch):
+            message = self.MESSAGES.get(kind)
+            if message is not None:
+                lines.append(message.format(**fields))
+        if lines:
+            stream = self.stream or sys.stdout
+            stream.write('\n'.join(lines) + '\n')
+            stream.flush()
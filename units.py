@@ -3,18 +3,70 @@ import pygame
 import pygame.gfxdraw as gfxdraw
 import consts
 import math
+import assets
+import pools
+
+
+# Pre-rendered tower layers, shared by towers that look the same
+_tower_layers = {}
+TOWER_LAYER_CACHE_SIZE = 32
+TOWER_LAYER_COLORKEY = (255, 0, 255)   # Must not be used by tower visuals
+
+# Orphaned shots look for a new target this close to them
+RETARGET_RADIUS = 100
+
+
+def doomed(enemy):
+    '''True if shots already in flight at enemy will kill it'''
+    return enemy.health <= enemy.pending_damage
+
+
+def nearest_enemy(enemies, pos, radius, ledger=False):
+    '''
+    Closest living enemy whose rect center is within radius of pos, by
+    linear scan. With ledger, enemies already doomed are skipped.
+    '''
+    cx, cy = pos
+    range_sq = radius * radius
+    # Simple “closest to tower” selection
+    best_enemy = None
+    best_dist_sq = None
+    for enemy in enemies:
+        if getattr(enemy, "state",
+                   "alive") != "alive" or enemy.health <= 0:
+            continue
+        if ledger and doomed(enemy):
+            continue
+        ex, ey = enemy.rect.center
+        dx = ex - cx
+        dy = ey - cy
+        dist_sq = dx * dx + dy * dy
+        if dist_sq <= range_sq and (
+                best_dist_sq is None or dist_sq < best_dist_sq):
+            best_dist_sq = dist_sq
+            best_enemy = enemy
+    return best_enemy
 
 
 class Tower:
     '''Class defining the tower'''
 
+    # Visuals
+    BODY_RADIUS = 20
+    BODY_COLOR = (0, 255, 0)
+    RANGE_COLOR = (0, 255, 0)
+    PREVIEW_COLOR = (255, 255, 0)
+
     def __init__(self, screen, health=100, regen=0.1,
-                 damage=1, range=200, cooldown=30, cash=0):
+                 damage=1, range=200, cooldown=30, cash=0, pos=None,
+                 ledger=False, attack_sound=None, projectile_pool=None):
 
         self.screen = screen                              # Game screen
 
         # Geometry
-        self.pos = (consts.TOWER_X, consts.TOWER_Y)       # Tower position
+        if pos is None:
+            pos = (consts.TOWER_X, consts.TOWER_Y)
+        self.pos = pos                                    # Tower position
 
         # Health
         self.health = health                              # Current health
@@ -36,56 +88,66 @@ class Tower:
         self.targets = []                                 # Current targets list
 
         self.current_target = None
+        self.ledger = ledger            # Skip enemies that shots in flight will kill
+
+        # Recycled projectiles for sprite-based shots, shareable between towers
+        if projectile_pool is None:
+            projectile_pool = pools.ObjectPool(Projectile)
+        self.projectile_pool = projectile_pool
 
         # Tower surface for drawing
         self.surface = pygame.Surface(
             (consts.TOWER_SIZE, consts.TOWER_SIZE), pygame.SRCALPHA)
 
-        # self.attack_sound = pygame.mixer.Sound('assets/sounds/shot_sound.wav')
+        # Played on every shot; an assets.SoundPool, loaded once
+        self.attack_sound = attack_sound
 
-    def update(self, enemies_group, projectiles_group):
+    def update(self, enemies_group, projectiles_group, targeted=False):
         '''
-        Updates tower for each frame
+        Updates tower for each frame. targeted means current_target has
+        already been checked and assigned this frame (see
+        EnemyGroup.assign_targets).
         '''
         if self.cooldown_count > 0:
             self.cooldown_count -= 1
 
-        self._update_targets(enemies_group)
+        if not targeted:
+            self._update_targets(enemies_group)
 
         if self.cooldown_count == 0 and self.current_target is not None:
-            shot = Projectile(
-                self.pos, self.current_target, speed=5, damage=self.damage)
-            projectiles_group.add(shot)
+            if hasattr(projectiles_group, 'fire'):
+                # Batched projectile groups own their shots
+                projectiles_group.fire(
+                    self.pos, self.current_target, speed=5, damage=self.damage)
+            else:
+                shot = self.projectile_pool.acquire(
+                    self.pos, self.current_target, speed=5, damage=self.damage)
+                projectiles_group.add(shot)
             self.cooldown_count = self.cooldown
-            # self.attack_sound.play()
+            if self.attack_sound is not None:
+                self.attack_sound.play()
 
     def _update_targets(self, enemies_group):
         '''
         Updates current targets list based on enemies in range
         '''
+        # Acquire target if we don't have one
+        if not self.has_valid_target():
+            if hasattr(enemies_group, 'nearest'):
+                # Spatially indexed groups only look at nearby enemies
+                self.current_target = enemies_group.nearest(self.pos, self.range)
+            else:
+                self.current_target = self._nearest_enemy(enemies_group)
+
+    def _nearest_enemy(self, enemies_group):
+        '''Closest living enemy in range, by linear scan'''
+        return nearest_enemy(enemies_group, self.pos, self.range, self.ledger)
+
+    def has_valid_target(self):
+        '''Drops the current target if it can no longer be shot'''
         if not self._valid_target(self.current_target):
             self.current_target = None
-
-        # Acquire target if we don't have one
-        if self.current_target is None:
-            cx, cy = self.pos
-            range_sq = self.range * self.range
-            # Simple “closest to tower” selection
-            best_enemy = None
-            best_dist_sq = None
-            for enemy in enemies_group:
-                if getattr(enemy, "state",
-                           "alive") != "alive" or enemy.health <= 0:
-                    continue
-                ex, ey = enemy.rect.center
-                dx = ex - cx
-                dy = ey - cy
-                dist_sq = dx * dx + dy * dy
-                if dist_sq <= range_sq and (
-                        best_dist_sq is None or dist_sq < best_dist_sq):
-                    best_dist_sq = dist_sq
-                    best_enemy = enemy
-            self.current_target = best_enemy
+        return self.current_target is not None
 
     def _valid_target(self, enemy):
         if enemy is None:
@@ -94,6 +156,8 @@ class Tower:
             return False
         if getattr(enemy, "state", "alive") != "alive" or enemy.health <= 0:
             return False
+        if self.ledger and doomed(enemy):
+            return False
         cx, cy = self.pos
         ex, ey = enemy.rect.center
         dx = ex - cx
@@ -129,16 +193,49 @@ class Tower:
 # RENDER FUNCTIONS
 ###############################################################################
 
-    def draw(self, screen):
-        '''Draw tower elements to screen surface'''
-        pygame.draw.circle(screen, (0, 255, 0), self.pos, 20)
-        #pygame.draw.circle(screen, (0, 100, 0), self.pos, self.range, 1)
-        self._draw_range_circle(screen)
-        
-    def _draw_range_circle(self, screen):
-        '''Draw the tower's range circle'''
+    def draw(self, screen, preview_range=None):
+        '''
+        Draw tower elements to screen surface. preview_range, if given, adds
+        a second dashed ring showing a prospective range.
+        '''
+        layer, offset = self._layer(self.range, self.RANGE_COLOR, self.BODY_COLOR)
+        topleft = (int(self.pos[0]) - offset, int(self.pos[1]) - offset)
+        screen.blit(layer, topleft)
+
+        if preview_range is not None and preview_range != self.range:
+            ring, offset = self._layer(preview_range, self.PREVIEW_COLOR)
+            screen.blit(ring, (int(self.pos[0]) - offset, int(self.pos[1]) - offset))
+
+    def _layer(self, ring_range, ring_color, body_color=None):
+        '''Cached surface with the dashed range ring (and body, if colored)'''
+        key = (ring_range, ring_color, body_color, self.BODY_RADIUS)
+        cached = _tower_layers.get(key)
+        if cached is None:
+            if len(_tower_layers) >= TOWER_LAYER_CACHE_SIZE:
+                del _tower_layers[next(iter(_tower_layers))]
+            cached = self._render_layer(ring_range, ring_color, body_color)
+            _tower_layers[key] = cached
+        return cached
+
+    def _render_layer(self, ring_range, ring_color, body_color):
+        '''Pre-render the tower body and dashed ring centered on a surface'''
+        offset = max(ring_range, self.BODY_RADIUS)
+        layer = pygame.Surface((2 * offset + 1, 2 * offset + 1))
+        layer.fill(TOWER_LAYER_COLORKEY)
+        if body_color is not None:
+            pygame.draw.circle(layer, body_color, (offset, offset), self.BODY_RADIUS)
+        #pygame.draw.circle(layer, (0, 100, 0), (offset, offset), ring_range, 1)
+        self._draw_range_circle(layer, (offset, offset), ring_range, ring_color)
+
+        # The layer is mostly empty, so a run-length encoded colorkey blit is
+        # far cheaper than per-pixel alpha
+        layer.set_colorkey(TOWER_LAYER_COLORKEY, pygame.RLEACCEL)
+        return layer, offset
+
+    def _draw_range_circle(self, surface, center, ring_range, color):
+        '''Draw a dashed range circle'''
         for angle in range(0, 360, 5):
-            gfxdraw.arc(screen, int(self.pos[0]), int(self.pos[1]), self.range, angle, angle + 2, (0, 255, 0))
+            gfxdraw.arc(surface, center[0], center[1], ring_range, angle, angle + 2, color)
 
 
 ###############################################################################
@@ -149,8 +246,20 @@ class Enemy(pygame.sprite.Sprite):
     Class defining enemies using pygame sprite system
     '''
 
+    # Fixed attribute set; pygame's Sprite base only keeps its group set
+    # in __dict__
+    __slots__ = ('state', 'health', 'death_timer', 'death_duration',
+                 'damage', 'x', 'y', 'speed', 'bounty', 'arrived',
+                 'pending_damage', 'assets', 'image', 'rect', 'pool', '_pooled')
+
     def __init__(self, x, y, health=1, damage=1, speed=1, bounty=1):
         super().__init__()
+        self.pool = None                # ObjectPool to return to on kill
+        self._pooled = False
+        self.reset(x, y, health, damage, speed, bounty)
+
+    def reset(self, x, y, health=1, damage=1, speed=1, bounty=1):
+        '''(Re)initialize every attribute, so pooled enemies start fresh'''
         self.state = 'alive'
         self.health = health
         self.death_timer = 0
@@ -160,17 +269,20 @@ class Enemy(pygame.sprite.Sprite):
         self.y = y
         self.speed = speed
         self.bounty = bounty
+        self.arrived = None             # Set by a contact scheduler, if any
+        self.pending_damage = 0         # Damage of shots in flight at it
 
-        self.base_image = pygame.Surface((20, 20), pygame.SRCALPHA)
-        # pygame.draw.polygon(
-        #     self.base_image,
-        #     (255, 255, 255),
-        #     [(16, 10), (10, 5), (10, 15)]  # little arrow tip on the right side
-        # )
-        pygame.draw.rect(self.base_image, (255, 0, 0), (0, 0, 20, 20))
-        self.image = self.base_image.copy()
+        # Artwork and rotated frames are shared by every enemy
+        self.assets = assets.get('enemy')
+        self.image = self.assets.base_image
         self.rect = self.image.get_rect(center=(self.x, self.y))
 
+    def kill(self):
+        '''Remove from all groups and return to the pool, if pooled'''
+        super().kill()
+        if self.pool is not None:
+            self.pool.release(self)
+
     def update(self):
         '''
         Updates enemy each frame
@@ -184,9 +296,6 @@ class Enemy(pygame.sprite.Sprite):
             self.state = 'dying'
             self.death_timer = 0
 
-        if self.state == 'dead':
-            self.kill()
-
     def _move(self):
         '''Moves enemy towards tower'''
         if self.state != 'alive':
@@ -195,11 +304,15 @@ class Enemy(pygame.sprite.Sprite):
         # Calculate direction to move
         direction = self._calculate_direction()
 
-        self.image = pygame.transform.rotate(
-            self.base_image, math.degrees(math.atan2(-direction[1], direction[0])))
+        self.image = self.assets.frames.frame(
+            math.degrees(math.atan2(-direction[1], direction[0])))
 
-        # Check if against the tower
-        if self.touching_tower():
+        # Check if against the tower. Scheduled enemies are told when they
+        # arrive; others measure their distance every frame
+        arrived = self.arrived
+        if arrived is None:
+            arrived = self.touching_tower()
+        if arrived:
             return
         else:
             self.x += direction[0] * self.speed
@@ -223,16 +336,10 @@ class Enemy(pygame.sprite.Sprite):
         # Calculate fade-out alpha
         alpha = max(0, 255 * (1 - self.death_timer / self.death_duration))
 
-        # Start with the base image
-        temp_image = self.base_image.copy()
-
-        # Apply alpha/transparency to it
-        temp_image.set_alpha(int(alpha))
-
-        # Now rotate it to face the tower
+        # Cached base image faded and rotated to face the tower
         angle = math.degrees(
             math.atan2(-(consts.TOWER_Y - self.y), (consts.TOWER_X - self.x)))
-        self.image = pygame.transform.rotate(temp_image, angle)
+        self.image = self.assets.frames.frame(angle, alpha)
 
         # Update rect to keep it centered (rotation changes size)
         self.rect = self.image.get_rect(center=(self.x, self.y))
@@ -255,24 +362,50 @@ class Enemy(pygame.sprite.Sprite):
 class Projectile(pygame.sprite.Sprite):
     '''Class defining projectiles shot by the tower'''
 
+    __slots__ = ('image', 'rect', 'target', 'speed', 'damage',
+                 'vx', 'vy', 'tracking', 'pool', '_pooled')
+
     def __init__(self, pos, target, speed=5, damage=10):
         super().__init__()
-        self.image = pygame.Surface((6, 6))
-        pygame.draw.circle(self.image, (255, 255, 0), (3, 3), 3)
+        self.pool = None                # ObjectPool to return to on kill
+        self._pooled = False
+        self.reset(pos, target, speed, damage)
+
+    def reset(self, pos, target, speed=5, damage=10):
+        '''(Re)initialize every attribute, so pooled projectiles start fresh'''
+        self.image = assets.get('projectile').base_image
         self.rect = self.image.get_rect(center=pos)
         self.target = target
         self.speed = speed
         self.damage = damage
+        target.pending_damage += damage
 
         # New: store velocity and whether we're still homing
         self.vx = 0.0
         self.vy = 0.0
         self.tracking = True
 
-    def update(self):
-        '''Moves projectile towards target (while alive), then flies straight'''
+    def kill(self):
+        '''Remove from all groups and return to the pool, if pooled'''
+        if self.tracking and self._alive_target():
+            self.target.pending_damage -= self.damage
+        self.tracking = False
+        super().kill()
+        if self.pool is not None:
+            self.pool.release(self)
+
+    def update(self, retarget_from=None):
+        '''
+        Moves projectile towards target (while alive), then flies straight.
+        With retarget_from, a group of enemies, a shot whose target died
+        first switches to the nearest enemy not already doomed, or is
+        retired if there is none.
+        '''
         # If we're still tracking, try to home in on the target
         if self.tracking:
+            if retarget_from is not None and not self._living_target():
+                if not self._retarget(retarget_from):
+                    return
             if not self._alive_target():
                 # Target is gone: stop tracking but keep current velocity
                 self.tracking = False
@@ -286,6 +419,8 @@ class Projectile(pygame.sprite.Sprite):
                 # Hit detection
                 if dist_sq <= 25:  # hit radius (~5 px)
                     self.target.health -= self.damage
+                    self.target.pending_damage -= self.damage
+                    self.tracking = False
                     self.kill()
                     return
 
@@ -314,3 +449,21 @@ class Projectile(pygame.sprite.Sprite):
             self.target is not None and
             self.target.alive()
         )
+
+    def _living_target(self):
+        '''Target can still be damaged'''
+        return (self._alive_target() and self.target.state == 'alive' and
+                self.target.health > 0)
+
+    def _retarget(self, enemies):
+        '''Switch to a new target near the shot, or retire. Returns True if switched'''
+        if self._alive_target():
+            self.target.pending_damage -= self.damage
+        target = nearest_enemy(enemies, self.rect.center, RETARGET_RADIUS, ledger=True)
+        if target is None:
+            self.tracking = False
+            self.kill()
+            return False
+        self.target = target
+        target.pending_damage += self.damage
+        return True